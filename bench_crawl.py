@@ -0,0 +1,290 @@
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from bench_parse import realistic_page
+from fixtures import LANGUAGES_HTML
+from hedge import Hedger
+from pipeline import ParsePool
+from proxy_pool import ProxyPool
+from ratelimit import RateLimiter
+from transport import Transport
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    # Serves search result pages (with pagination) and repo pages shaped like GitHub's.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        time.sleep(max(0.0, random.gauss(config["latency"], config["latency"] / 4)))
+        if random.random() < config["error_rate"]:
+            return self.send_body(500, b"Internal Server Error")
+        if random.random() < config.get("throttle_rate", 0.0):
+            return self.send_body(429, b"You have exceeded a secondary rate limit.", {"Retry-After": "1"})
+        url = urlsplit(self.path)
+        if url.path == "/search":
+            query = parse_qs(url.query)
+            page = int(query.get("p", ["1"])[0])
+            return self.send_body(200, self.server.search_page(query.get("type", ["repositories"])[0], page))
+        return self.send_body(200, self.server.repo_page)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config):
+        super().__init__(("127.0.0.1", 0), FakeGitHubHandler)
+        self.config = config
+        self.repo_page = realistic_page(LANGUAGES_HTML, config["repo_page_kb"])
+
+    def search_page(self, type_, page):
+        per_page = self.config["results_per_page"]
+        first = (page - 1) * per_page
+        if type_ == "issues":
+            items = "".join(f'<a class="Link--muted color-fg-muted" href="/owner{i}/repo{i}/issues">#{i}</a>'
+                            for i in range(first, first + per_page))
+            results = f'<div id="issue_search_results">{items}</div>'
+        elif type_ == "wikis":
+            items = "".join(f'<div class="f4 text-normal"><a href="/owner{i}/repo{i}/wiki/Home">Home</a></div>'
+                            for i in range(first, first + per_page))
+            results = f'<div id="wiki_search_results">{items}</div>'
+        else:
+            items = "".join(f'<li><a href="/owner{i}/repo{i}">owner{i}/repo{i}</a></li>'
+                            for i in range(first, first + per_page))
+            results = f'<ul class="repo-list">{items}</ul>'
+        pagination = '<a class="next_page" rel="next" href="#">Next</a>' if page < self.config["pages"] else ""
+        return realistic_page(results + pagination, self.config["search_page_kb"])
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    # Plain HTTP forward proxy: requests sends it absolute URLs, which are relayed to the target.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            dead = server.die_after and server.requests > server.die_after
+        if dead:
+            # A dead free proxy usually just hangs up.
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        time.sleep(server.latency)
+        url = urlsplit(self.path)
+        upstream = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        try:
+            upstream.request("GET", url.path + ("?" + url.query if url.query else ""),
+                             headers={"User-Agent": self.headers.get("User-Agent", "")})
+            response = upstream.getresponse()
+            body = response.read()
+        finally:
+            upstream.close()
+        self.send_response(response.status)
+        if response.getheader("Retry-After"):
+            self.send_header("Retry-After", response.getheader("Retry-After"))
+        self.send_header("Content-Type", response.getheader("Content-Type", "text/html"))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, die_after):
+        super().__init__(("127.0.0.1", 0), ProxyHandler)
+        self.latency = latency
+        self.die_after = die_after
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def unused_port():
+    # An address nothing listens on, standing in for a proxy that is already dead.
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_servers(config):
+    servers = [FakeGitHubServer(config)]
+    proxies = []
+    for i in range(config["proxies"]):
+        die_after = config["proxy_die_after"] if i < config["dying_proxies"] else 0
+        servers.append(ProxyServer(config["proxy_latency"], die_after))
+        proxies.append(f"127.0.0.1:{servers[-1].server_address[1]}")
+    proxies += [f"127.0.0.1:{unused_port()}" for _ in range(config["dead_proxies"])]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{servers[0].server_address[1]}"
+    return servers, base_url, proxies
+
+
+def serve(config, ready, stop):
+    servers, base_url, proxies = start_servers(config)
+    ready.put((base_url, proxies))
+    stop.wait()
+    for server in servers:
+        server.shutdown()
+
+
+class TimedTransport(Transport):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def get(self, proxy, url, headers, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().get(proxy, url, headers, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_benchmark(config, base_url, proxies):
+    parse_times = []
+    get_extra_info = main.get_extra_info
+
+    def timed_get_extra_info(response, parser=None):
+        start = time.perf_counter()
+        try:
+            return get_extra_info(response, parser)
+        finally:
+            parse_times.append(time.perf_counter() - start)
+
+    fetch_times = []
+    get_proxy_and_response = main.get_proxy_and_response
+
+    def timed_get_proxy_and_response(*args, **kwargs):
+        # Time of a whole fetch, including retries on other proxies and hedged requests.
+        start = time.perf_counter()
+        try:
+            return get_proxy_and_response(*args, **kwargs)
+        finally:
+            fetch_times.append(time.perf_counter() - start)
+
+    main.get_extra_info = timed_get_extra_info
+    main.get_proxy_and_response = timed_get_proxy_and_response
+    rate_limiter = RateLimiter(initial_concurrency=config["workers"], max_concurrency=config["workers"])
+    hedger = Hedger(max_hedges=config["max_hedges"]) if config.get("max_hedges") else None
+    transport = TimedTransport(pool_maxsize=max(config["workers"], 1), timeout=config["timeout"],
+                               rate_limiter=rate_limiter, hedger=hedger)
+    pool = ProxyPool(proxies)
+    parse_pool = ParsePool(config["parse_processes"]) if config.get("parse_processes") else None
+    start = time.perf_counter()
+    try:
+        records = main.search("python", pool, config["type"], config["workers"], config["max_per_proxy"], transport,
+                              config["pages"], None, None, None, base_url, parser=parse_pool)
+    finally:
+        elapsed = time.perf_counter() - start
+        main.get_extra_info = get_extra_info
+        main.get_proxy_and_response = get_proxy_and_response
+        transport.close()
+        if parse_pool is not None:
+            parse_pool.close()
+    return {
+        "results": len(records),
+        "failed": sum(1 for record in records if "error" in record),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(records) / elapsed, 2),
+        "requests": len(transport.latencies),
+        "latency_p50_ms": round(percentile(transport.latencies, 0.5) * 1000, 2),
+        "latency_p95_ms": round(percentile(transport.latencies, 0.95) * 1000, 2),
+        "fetch_p99_ms": round(percentile(fetch_times, 0.99) * 1000, 2),
+        "parse_ms_per_page": round(sum(parse_times) / len(parse_times) * 1000, 2) if parse_times else 0.0,
+        # ru_maxrss is in KB on Linux; the servers run in their own process and are not counted.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_rps']} < baseline {baseline['throughput_rps']}")
+    for key in ("latency_p95_ms", "parse_ms_per_page", "peak_rss_mb"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline crawl benchmark against a local fake GitHub and proxies')
+    parser.add_argument('--type', type=str, choices=['repositories', 'issues', 'wikis'], default='repositories')
+    parser.add_argument('--pages', type=int, help='Number of search result pages', default=3)
+    parser.add_argument('--results_per_page', type=int, default=10)
+    parser.add_argument('--repo_page_kb', type=int, help='Size of a repo page', default=300)
+    parser.add_argument('--search_page_kb', type=int, help='Size of a search page', default=150)
+    parser.add_argument('--latency', type=float, help='Mean server latency in seconds', default=0.05)
+    parser.add_argument('--error_rate', type=float, help='Probability that the server answers 500', default=0.0)
+    parser.add_argument('--throttle_rate', type=float, help='Probability that the server answers 429 with Retry-After', default=0.0)
+    parser.add_argument('--proxies', type=int, help='Number of working proxies', default=4)
+    parser.add_argument('--proxy_latency', type=float, help='Latency added by every proxy in seconds', default=0.01)
+    parser.add_argument('--dead_proxies', type=int, help='Number of unreachable proxies', default=2)
+    parser.add_argument('--dying_proxies', type=int, help='Number of working proxies that die during the run', default=1)
+    parser.add_argument('--proxy_die_after', type=int, help='Requests served by a dying proxy before it dies', default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max_per_proxy', type=int, default=None)
+    parser.add_argument('--max_hedges', type=int, help='Backup requests per slow request (0 disables hedging)', default=0)
+    parser.add_argument('--parse_processes', type=int, help='Parse in this many worker processes (0 parses in the fetcher threads)', default=0)
+    parser.add_argument('--timeout', type=float, help='Client timeout per request in seconds', default=5)
+    parser.add_argument('--save', type=str, help='Write the results to this JSON file', default=None)
+    parser.add_argument('--compare', type=str, help='Baseline JSON file; exit with 1 on regression', default=None)
+    parser.add_argument('--tolerance', type=float, help='Allowed relative regression against --compare', default=0.2)
+    args = parser.parse_args()
+    config = vars(args)
+    logging.getLogger("retrieve_github").setLevel(logging.WARNING)
+
+    ready, stop = multiprocessing.Queue(), multiprocessing.Event()
+    server_process = multiprocessing.Process(target=serve, args=(config, ready, stop), daemon=True)
+    server_process.start()
+    try:
+        base_url, proxies = ready.get(timeout=30)
+        result = run_benchmark(config, base_url, proxies)
+    finally:
+        stop.set()
+        server_process.join(timeout=5)
+    print(json.dumps(result, indent=4))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=4)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,78 @@
+import argparse
+import logging
+import time
+from bs4 import BeautifulSoup
+
+import parsing
+from main import get_extra_info, search_repo, search_issues, search_wikis
+from pipeline import InlineParser
+from fixtures import LANGUAGES_HTML, ISSUES_HTML, WIKIS_HTML, REPO_LIST_HTML, make_response
+
+# Markup that surrounds the useful part of a real GitHub page (navigation, file tree, scripts...).
+FILLER = (
+    '<div class="Box-row"><ul class="list-style-none">'
+    + '<li class="d-flex"><a class="Link--primary" href="/owner/repo/blob/main/file{i}.py">file{i}.py</a>'
+      '<span class="color-fg-muted">Update file{i}.py</span><relative-time datetime="2023-04-28">Apr 28</relative-time></li>'
+    * 20
+    + '</ul></div><script type="application/json">{{"payload": "' + 'x' * 400 + '"}}</script>'
+)
+
+
+def realistic_page(html, size_kb):
+    html = html.decode() if isinstance(html, bytes) else html
+    filler = []
+    while sum(len(chunk) for chunk in filler) < size_kb * 1024:
+        filler.append(FILLER.format(i=len(filler)))
+    half = len(filler) // 2
+    return ("<html><body>" + "".join(filler[:half]) + html + "".join(filler[half:]) + "</body></html>").encode()
+
+
+def timed(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench(size_kb, repeat):
+    response = make_response(realistic_page(LANGUAGES_HTML, size_kb))
+    search_pages = {
+        "repositories": (realistic_page(REPO_LIST_HTML, size_kb // 2), search_repo),
+        "issues": (realistic_page(ISSUES_HTML, size_kb // 2), search_issues),
+        "wikis": (realistic_page(WIKIS_HTML, size_kb // 2), search_wikis),
+    }
+
+    def legacy_repo_page():
+        # Full html.parser tree, as get_extra_info used to build.
+        soup = BeautifulSoup(response.content, 'html.parser')
+        return soup.find("h2", string="Languages") is not None
+
+    baseline, _ = timed(legacy_repo_page, repeat)
+    print(f"Repo page ({len(response.content) // 1024} KB)")
+    print(f"  {'full html.parser (legacy)':<32}{baseline * 1000:9.2f} ms")
+    for backend in parsing.available_backends():
+        parser = InlineParser(backend)
+        elapsed, result = timed(lambda: get_extra_info(response, parser), repeat)
+        print(f"  {backend + ' targeted':<32}{elapsed * 1000:9.2f} ms  x{baseline / elapsed:5.1f}  {result}")
+
+    for type_, (page, extract) in search_pages.items():
+        baseline, expected = timed(lambda: extract(BeautifulSoup(page, 'html.parser'), 'https://github.com'), repeat)
+        print(f"Search page: {type_} ({len(page) // 1024} KB)")
+        print(f"  {'full html.parser (legacy)':<32}{baseline * 1000:9.2f} ms")
+        for backend in parsing.available_backends():
+            strainer = parsing.search_strainer(type_)
+            elapsed, result = timed(lambda: extract(parsing.make_soup(page, strainer, backend), 'https://github.com'),
+                                    repeat)
+            same = "identical" if result == expected else "MISMATCH"
+            print(f"  {backend + ' targeted':<32}{elapsed * 1000:9.2f} ms  x{baseline / elapsed:5.1f}  {same}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-page parse time of every available parser backend')
+    parser.add_argument('--size_kb', type=int, help='Approximate size of a repo page', default=300)
+    parser.add_argument('--repeat', type=int, help='Number of runs per measurement (best is reported)', default=5)
+    args = parser.parse_args()
+    logging.getLogger("retrieve_github").setLevel(logging.WARNING)
+    bench(args.size_kb, args.repeat)
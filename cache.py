@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+log = logging.getLogger("retrieve_github")
+
+
+class ResponseCache:
+    # Persistent cache of successful GET responses keyed by URL and query params. Bodies are stored
+    # zlib-compressed in a SQLite file; stale entries are revalidated with ETag/Last-Modified and the
+    # least recently used entries are evicted once the cache grows past max_bytes.
+    def __init__(self, path, ttl=6 * 3600, max_bytes=256 * 1024 * 1024):
+        if ttl < 0 or max_bytes < 1:
+            raise ValueError(f"Invalid cache settings: ttl={ttl}, max_bytes={max_bytes}")
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY, url TEXT, headers TEXT, body BLOB,
+                                size INTEGER, stored_at REAL, last_access REAL)""")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(url, params=None):
+        if isinstance(params, dict):
+            params = sorted((str(k), str(v)) for k, v in params.items())
+        return hashlib.sha256(json.dumps([url, params]).encode()).hexdigest()
+
+    def lookup(self, url, params=None):
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._db.execute("SELECT headers, body, stored_at FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return {"key": key, "url": url, "headers": json.loads(row[0]), "body": row[1], "stored_at": row[2]}
+
+    def is_fresh(self, entry):
+        return time.time() - entry["stored_at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    @staticmethod
+    def to_response(entry):
+        from requests import Response
+        response = Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response.headers.update(entry["headers"])
+        response._content = zlib.decompress(entry["body"])
+        response._content_consumed = True
+        response.from_cache = True
+        return response
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def refresh(self, entry, response):
+        # The server answered 304 Not Modified: keep the stored body and restart its TTL.
+        headers = dict(entry["headers"])
+        for name in ("ETag", "Last-Modified"):
+            if response.headers.get(name):
+                headers[name] = response.headers[name]
+        with self._lock:
+            self.revalidated += 1
+            self._db.execute("UPDATE responses SET headers = ?, stored_at = ? WHERE key = ?",
+                             (json.dumps(headers), time.time(), entry["key"]))
+            self._db.commit()
+        entry = dict(entry, headers=headers)
+        return self.to_response(entry)
+
+    def store(self, url, params, response):
+        headers = {name: response.headers[name] for name in ("ETag", "Last-Modified", "Content-Type")
+                   if response.headers.get(name)}
+        body = zlib.compress(response.content)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (self.make_key(url, params), url, json.dumps(headers), body, len(body), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        log.info(f"Response cache evicted {evicted} entries")
+
+    def summary(self):
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,193 @@
+import argparse
+import importlib.util
+import itertools
+import json
+import logging
+import os
+from array import array
+log = logging.getLogger("retrieve_github")
+
+COLUMNAR_EXTENSIONS = (".parquet", ".npz")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The columnar format needs numpy (pip install numpy), and pyarrow for Parquet")
+    return numpy
+
+
+def columnar_extension():
+    # Parquet when pyarrow is installed, a NumPy .npz archive otherwise.
+    return ".parquet" if importlib.util.find_spec("pyarrow") is not None else ".npz"
+
+
+class LanguageColumns:
+    # Repo records in a columnar layout: one row per repo, and the language stats of all the repos
+    # flattened into lang_ids (ids into the interned `languages`) and float32 percentages. The stats
+    # of row i are at offsets[i]:offsets[i + 1].
+    def __init__(self, urls, owners, updated, errors, languages, offsets, lang_ids, percentages):
+        self.urls = urls
+        self.owners = owners
+        self.updated = updated
+        self.errors = errors
+        self.languages = languages
+        self.offsets = offsets
+        self.lang_ids = lang_ids
+        self.percentages = percentages
+
+    @classmethod
+    def from_records(cls, records):
+        vocabulary = {}
+        urls, owners, updated, errors = [], [], [], []
+        offsets, lang_ids, percentages = array('q', [0]), array('i'), array('f')
+        for record in records:
+            extra = record.get("extra")
+            urls.append(record.get("url"))
+            owners.append(extra.get("owner") if extra is not None else None)
+            updated.append(record.get("updated"))
+            errors.append(record.get("error"))
+            for language, percentage in (extra or {}).get("language_stats", {}).items():
+                lang_ids.append(vocabulary.setdefault(language, len(vocabulary)))
+                percentages.append(percentage)
+            offsets.append(len(lang_ids))
+        return cls(urls, owners, updated, errors, list(vocabulary), offsets, lang_ids, percentages)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def records(self):
+        # Back to the JSON layout. Percentages went through float32, so they are rounded to 3 decimals.
+        for i, url in enumerate(self.urls):
+            record = {"url": url}
+            if self.owners[i] is not None:
+                stats = {self.languages[self.lang_ids[j]]: round(float(self.percentages[j]), 3)
+                         for j in range(self.offsets[i], self.offsets[i + 1])}
+                record["extra"] = {"owner": self.owners[i], "language_stats": stats}
+            if self.updated[i] is not None:
+                record["updated"] = self.updated[i]
+            if self.errors[i] is not None:
+                record["error"] = self.errors[i]
+            yield record
+
+    def language_totals(self):
+        # Sum of the percentages of every language over all the repos, in one vectorized pass.
+        np = _numpy()
+        totals = np.bincount(np.asarray(self.lang_ids, dtype=np.int32), minlength=len(self.languages),
+                             weights=np.asarray(self.percentages, dtype=np.float32))
+        return dict(zip(self.languages, totals.tolist()))
+
+
+def _write_npz(columns, path):
+    np = _numpy()
+
+    def strings(values):
+        # Fixed-width unicode arrays load without pickle; None is stored as "".
+        return np.array(["" if value is None else value for value in values], dtype=str)
+
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, urls=strings(columns.urls), owners=strings(columns.owners),
+                            updated=strings(columns.updated), errors=strings(columns.errors),
+                            languages=strings(columns.languages),
+                            offsets=np.frombuffer(columns.offsets, dtype=np.int64),
+                            lang_ids=np.frombuffer(columns.lang_ids, dtype=np.int32),
+                            percentages=np.frombuffer(columns.percentages, dtype=np.float32))
+
+
+def _read_npz(path):
+    np = _numpy()
+    with np.load(path, allow_pickle=False) as data:
+        def strings(name):
+            return [value or None for value in data[name].tolist()]
+        return LanguageColumns(strings("urls"), strings("owners"), strings("updated"), strings("errors"),
+                               data["languages"].tolist(), data["offsets"], data["lang_ids"], data["percentages"])
+
+
+def _write_parquet(columns, path):
+    import pyarrow
+    import pyarrow.parquet
+    np = _numpy()
+    offsets = pyarrow.array(np.frombuffer(columns.offsets, dtype=np.int64).astype(np.int32))
+    table = pyarrow.table({
+        "url": pyarrow.array(columns.urls, pyarrow.string()),
+        "owner": pyarrow.array(columns.owners, pyarrow.string()),
+        "updated": pyarrow.array(columns.updated, pyarrow.string()),
+        "error": pyarrow.array(columns.errors, pyarrow.string()),
+        "language_ids": pyarrow.ListArray.from_arrays(offsets, pyarrow.array(columns.lang_ids, pyarrow.int32())),
+        "percentages": pyarrow.ListArray.from_arrays(offsets, pyarrow.array(columns.percentages,
+                                                                            pyarrow.float32())),
+    })
+    table = table.replace_schema_metadata({"languages": json.dumps(columns.languages)})
+    pyarrow.parquet.write_table(table, path)
+
+
+def _read_parquet(path):
+    import pyarrow.parquet
+    table = pyarrow.parquet.read_table(path)
+    language_ids = table.column("language_ids").combine_chunks()
+    percentages = table.column("percentages").combine_chunks()
+    return LanguageColumns(table.column("url").to_pylist(), table.column("owner").to_pylist(),
+                           table.column("updated").to_pylist(), table.column("error").to_pylist(),
+                           json.loads(table.schema.metadata[b"languages"]), language_ids.offsets.to_numpy(),
+                           language_ids.values.to_numpy(), percentages.values.to_numpy())
+
+
+def write_columnar(records, path):
+    columns = records if isinstance(records, LanguageColumns) else LanguageColumns.from_records(records)
+    if path.endswith(".parquet"):
+        _write_parquet(columns, path)
+    elif path.endswith(".npz"):
+        _write_npz(columns, path)
+    else:
+        raise ValueError(f"Columnar output must be a .parquet or .npz file: {path}")
+    return columns
+
+
+def read_columnar(path):
+    if path.endswith(".parquet"):
+        return _read_parquet(path)
+    if path.endswith(".npz"):
+        return _read_npz(path)
+    raise ValueError(f"Columnar input must be a .parquet or .npz file: {path}")
+
+
+def save_columnar(retrieved_info, output_file, type_, append_output=False):
+    # Same naming as save_json: output.json -> output_repositories.parquet (or .npz).
+    base_name, _ = os.path.splitext(output_file)
+    output_file = base_name + "_" + type_.lower() + columnar_extension()
+    if os.path.exists(output_file) and append_output:
+        # Columnar files can't be appended to in place, the previous records are rewritten with the new ones.
+        retrieved_info = itertools.chain(read_columnar(output_file).records(), retrieved_info)
+    columns = write_columnar(retrieved_info, output_file)
+    log.info(f"Wrote {len(columns)} records to {output_file}")
+    return output_file
+
+
+def convert(input_file, output_file):
+    # JSON/JSONL <-> Parquet/NPZ, picked by the file extensions.
+    from utils import read_jsonl
+    if input_file.endswith(COLUMNAR_EXTENSIONS):
+        records = read_columnar(input_file).records()
+        with open(output_file, 'w') as f:
+            if output_file.endswith(".jsonl"):
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            else:
+                json.dump(list(records), f, indent=4)
+    else:
+        if input_file.endswith(".jsonl"):
+            records = read_jsonl(input_file)
+        else:
+            with open(input_file, 'r') as f:
+                records = json.load(f)
+        write_columnar(records, output_file)
+    return output_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert crawler output between JSON/JSONL and Parquet/NPZ')
+    parser.add_argument('input_file', type=str, help='.json, .jsonl, .parquet or .npz file')
+    parser.add_argument('output_file', type=str, help='.json, .jsonl, .parquet or .npz file')
+    args = parser.parse_args()
+    print(convert(args.input_file, args.output_file))
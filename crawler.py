@@ -0,0 +1,157 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional
+import main
+from proxy_pool import ProxyPool
+from ratelimit import RateLimiter
+from hedge import Hedger
+from parsing import check_parser_backend, get_parser_backend
+from pipeline import InlineParser, ParsePool
+from probe import PROBE_URL, warm_up
+log = logging.getLogger("retrieve_github")
+
+
+@dataclass
+class CrawlConfig:
+    workers: int = 1
+    max_per_proxy: Optional[int] = None
+    max_pages: int = 1
+    max_results: Optional[int] = None
+    stream_budget_kb: Optional[int] = None
+    parser: str = "auto"
+    parse_processes: int = 0
+    base_url: str = "https://github.com"
+
+
+@dataclass
+class NetworkConfig:
+    pool_connections: int = 4
+    pool_maxsize: int = 10
+    timeout: float = 5
+    proxy_health_file: Optional[str] = None
+    cache_file: Optional[str] = None
+    cache_ttl: int = 6 * 3600
+    cache_max_mb: int = 256
+    rate_limit: Optional[float] = None
+    rate_burst: int = 1
+    throttle_retries: int = 3
+    max_hedges: int = 0
+    hedge_delay: Optional[float] = None
+    hedge_budget: float = 0.1
+    probe_url: str = PROBE_URL
+    probe_timeout: float = 2.0
+
+
+def configure_logging(log_file="log.txt", level=logging.DEBUG):
+    # Colored console output plus a log file that is replaced on every run. Only the command line
+    # calls this; an application embedding the Crawler keeps its own logging setup.
+    import colorlog
+    log.setLevel(level)
+    handler = colorlog.StreamHandler()
+    handler.setFormatter(
+        colorlog.ColoredFormatter(
+            "%(log_color)s%(levelname)-8s%(reset)s %(blue)s%(message)s",
+            log_colors={
+                'DEBUG':    'cyan',
+                'INFO':     'green',
+                'WARNING':  'yellow',
+                'ERROR':    'red',
+                'CRITICAL': 'red,bg_white',
+            },
+            secondary_log_colors={},
+            style='%'
+        )
+    )
+    log.addHandler(handler)
+    if log_file:
+        log.addHandler(logging.FileHandler(log_file, mode='w'))
+
+
+class Crawler:
+    # Everything a crawl shares between its requests (proxy pool, keep-alive connections, response
+    # cache, rate limiter, hedging, page parser), built from config objects. Nothing is read or
+    # written on disk except the files the config names, and no process-wide setting is changed, so
+    # several crawlers can run side by side.
+    def __init__(self, proxies, config=None, network=None):
+        # The HTTP stack is imported when a crawler is created, not when this module is imported.
+        from cache import ResponseCache
+        from transport import Transport
+        self.config = config or CrawlConfig()
+        self.network = network or NetworkConfig()
+        check_parser_backend(self.config.parser)
+        if self.config.parse_processes > 0 and self.config.workers < 2:
+            # A single fetcher waits for every page it hands over, so fetching and parsing never
+            # overlap and the processes only add pickling and IPC.
+            raise ValueError(f"parse_processes needs at least 2 workers, got workers={self.config.workers}")
+        self.pool = proxies if isinstance(proxies, ProxyPool) else ProxyPool(
+            proxies, health_file=self.network.proxy_health_file)
+        self.cache = None
+        if self.network.cache_file:
+            self.cache = ResponseCache(self.network.cache_file, ttl=self.network.cache_ttl,
+                                       max_bytes=self.network.cache_max_mb * 1024 * 1024)
+        workers = self.config.workers
+        self.rate_limiter = RateLimiter(rate=self.network.rate_limit, burst=self.network.rate_burst,
+                                        initial_concurrency=workers, max_concurrency=workers,
+                                        max_throttle_retries=self.network.throttle_retries)
+        self.hedger = None
+        if self.network.max_hedges > 0:
+            self.hedger = Hedger(delay=self.network.hedge_delay, max_hedges=self.network.max_hedges,
+                                 max_extra_load=self.network.hedge_budget)
+        self.transport = Transport(pool_connections=self.network.pool_connections,
+                                   pool_maxsize=max(self.network.pool_maxsize, workers),
+                                   timeout=self.network.timeout, cache=self.cache,
+                                   rate_limiter=self.rate_limiter, hedger=self.hedger)
+        self.probe_results = None
+        if self.config.parse_processes > 0:
+            # The default of two pages per process keeps every process busy; with more fetchers than
+            # that (or several daemon jobs) the extra fetchers wait before handing over their page.
+            self.parser = ParsePool(self.config.parse_processes, backend=self.config.parser)
+        else:
+            self.parser = InlineParser(self.config.parser)
+        log.info(f"Using parser backend: {get_parser_backend(self.config.parser)}")
+
+    def warm_up(self):
+        # Probes the proxies, drops the unreachable ones and opens a connection through the others.
+        self.probe_results = warm_up(self.pool, self.transport, self.network.probe_url, self.network.probe_timeout)
+        return self.probe_results
+
+    @property
+    def stream_budget(self):
+        return self.config.stream_budget_kb * 1024 if self.config.stream_budget_kb else None
+
+    def iter_search(self, keywords, type_, memo=None, journal=None, recrawl=None, max_pages=None, max_results=None):
+        # keywords is a list of words or a query string; records are yielded as they are retrieved.
+        # max_pages and max_results override the config for this search only.
+        query = keywords if isinstance(keywords, str) else '+'.join(keywords)
+        config = self.config
+        max_pages = max_pages or config.max_pages
+        max_results = max_results or config.max_results
+        return main.iter_search(query, self.pool, type_, config.workers, config.max_per_proxy, self.transport,
+                                max_pages, max_results, self.stream_budget, memo, config.base_url, journal,
+                                recrawl, self.parser)
+
+    def search(self, keywords, type_, memo=None, journal=None, recrawl=None, max_pages=None, max_results=None):
+        records = list(self.iter_search(keywords, type_, memo, journal, recrawl, max_pages, max_results))
+        main.log_failed_enrichments(records)
+        return records
+
+    def summary(self):
+        summary = {"proxies": {proxy: self.pool.stats(proxy) for proxy in self.pool}}
+        if self.cache is not None:
+            summary["cache"] = self.cache.summary()
+        if self.hedger is not None:
+            summary["hedging"] = self.hedger.summary()
+        if self.probe_results is not None:
+            summary["probe"] = self.probe_results
+        return summary
+
+    def close(self):
+        self.transport.close()
+        self.pool.save()
+        self.parser.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,80 @@
+from requests import Response
+
+# Pages shaped like GitHub's, shared by the tests and the benchmarks.
+LANGUAGES_HTML = b'''
+    <html>
+    <head></head>
+    <body>
+        <h2>Languages</h2>
+        <div>
+            <li class="d-inline">
+                <span class="color-fg-default text-bold mr-1">Python</span>
+                <span>60%</span>
+            </li>
+            <li class="d-inline">
+                <span class="color-fg-default text-bold mr-1">JavaScript</span>
+                <span>40%</span>
+            </li>
+        </div>
+    </body>
+    </html>
+    '''
+
+ISSUES_HTML = '''
+        <html>
+            <body>
+                <div id="issue_search_results">
+                    <a class="Link--muted color-fg-muted" data-hovercard-type="repository" data-hovercard-url="/wallabag/wallabag/hovercard" href="/wallabag/wallabag/issues">#1</a>
+                    <a class="Link--muted color-fg-muted" data-hovercard-type="repository" data-hovercard-url="/wallabag/wallabag/hovercard" href="/wallabag/wallabag/issues">#2</a>
+                    <a class="Link--muted color-fg-muted" data-hovercard-type="repository" data-hovercard-url="/wallabag/wallabag/hovercard" href="/wallabag/wallabag/issues">#3</a>
+                </div>
+            </body>
+        </html>
+    '''
+
+WIKIS_HTML = '''
+        <html>
+            <body>
+                <div id="wiki_search_results">
+                    <div class="f4 text-normal">
+                        <a data-hydro-click='{"event_type":"search_result.click","payload":{"page_number":1,"per_page":10,"query":"openstack css","result_position":1,"click_id":10041081,"result":{"id":10041081,"global_relay_id":"MDEwOlJlcG9zaXRvcnkxMDA0MTA4MQ==","model_name":"Repository","url":"https://github.com//CCI-MOC/moc-public/wiki/Debugging-the-installed-version-of-Horizon"},"originating_url":"https://github.com/search?q=openstack+css&amp;type=Wikis","user_id":null}}' data-hydro-click-hmac="7ddc4c79c4085e76aba4b2b783fe4fa1aa30f0f12e16203a510abbda9868779f" href="/CCI-MOC/moc-public/wiki/Debugging" title="Debugging the installed version of Horizon">Debugging the installed version of Horizon</a>
+                    </div>
+                    <div class="f4 text-normal">
+                        <a data-hydro-click='{"event_type":"search_result.click","payload":{"page_number":1,"per_page":10,"query":"openstack css","result_position":1,"click_id":10041081,"result":{"id":10041081,"global_relay_id":"MDEwOlJlcG9zaXRvcnkxMDA0MTA4MQ==","model_name":"Repository","url":"https://github.com//CCI-MOC/moc-public/wiki/Debugging-the-installed-version-of-Horizon"},"originating_url":"https://github.com/search?q=openstack+css&amp;type=Wikis","user_id":null}}' data-hydro-click-hmac="7ddc4c79c4085e76aba4b2b783fe4fa1aa30f0f12e16203a510abbda9868779f" href="/CCI-MOC/moc-public/wiki/the-installed" title="Debugging the installed version of Horizon">Debugging the installed version of Horizon</a>
+                    </div>
+                    <div class="f4 text-normal">
+                        <a data-hydro-click='{"event_type":"search_result.click","payload":{"page_number":1,"per_page":10,"query":"openstack css","result_position":1,"click_id":10041081,"result":{"id":10041081,"global_relay_id":"MDEwOlJlcG9zaXRvcnkxMDA0MTA4MQ==","model_name":"Repository","url":"https://github.com//CCI-MOC/moc-public/wiki/Debugging-the-installed-version-of-Horizon"},"originating_url":"https://github.com/search?q=openstack+css&amp;type=Wikis","user_id":null}}' data-hydro-click-hmac="7ddc4c79c4085e76aba4b2b783fe4fa1aa30f0f12e16203a510abbda9868779f" href="/CCI-MOC/moc-public/wiki/Horizon" title="Debugging the installed version of Horizon">Debugging the installed version of Horizon</a>
+                    </div>
+                </div>
+            </body>
+        </html>
+    '''
+
+REPO_LIST_HTML = """
+    <ul class="repo-list">
+        <li>
+            <a href="/abhirawat7/Astack-OpenStack-PythonFlask-"></a>
+        </li>
+        <li>
+            <a href="/michealbalogun/Horizon-dashboard"></a>
+        </li>
+        <li>
+            <a href="/airavata-courses/IU-Witcher-2020"></a>
+        </li>
+    </ul>
+    """
+
+
+def make_response(content, status_code=200, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = content.encode() if isinstance(content, str) else content
+    response._content_consumed = True
+    return response
+
+
+def make_search_page(hrefs, next_page):
+    items = ''.join(f'<li><a href="{href}"></a></li>' for href in hrefs)
+    pagination = '<a class="next_page" rel="next" href="/search?p=2">Next</a>' if next_page else ''
+    return make_response(f'<ul class="repo-list">{items}</ul>{pagination}')
@@ -0,0 +1,113 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+log = logging.getLogger("retrieve_github")
+
+Task = namedtuple("Task", "id kind key job payload attempts")
+
+
+class Frontier:
+    # Work queue shared by any number of worker processes through a SQLite file. Tasks are
+    # deduplicated by key, and a worker leases a task for lease_seconds: if the worker dies the lease
+    # expires and another worker takes the task over. A task that keeps failing is given up after
+    # max_attempts. "export" tasks are only handed out once all the other work is finished.
+    def __init__(self, path, lease_seconds=300.0, max_attempts=3):
+        if lease_seconds <= 0 or max_attempts < 1:
+            raise ValueError(f"Invalid frontier settings: lease_seconds={lease_seconds}, max_attempts={max_attempts}")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode, the lease takes the write lock explicitly with BEGIN IMMEDIATE.
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # WAL lets workers read while another one writes. It relies on shared memory, so every worker
+        # must run on the same host, and the file can't live on a network file system.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, key TEXT UNIQUE, job TEXT,
+                                payload TEXT, status TEXT DEFAULT 'pending', lease_owner TEXT,
+                                lease_expires REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, kind)")
+
+    def add(self, kind, key, payload, job=None):
+        # Returns False when a task with this key was already added, by this or any other worker.
+        with self._lock:
+            cursor = self._db.execute("INSERT OR IGNORE INTO tasks (kind, key, job, payload) VALUES (?, ?, ?, ?)",
+                                      (kind, key, job, json.dumps(payload)))
+        return cursor.rowcount == 1
+
+    def lease(self, worker):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("""UPDATE tasks SET status = 'failed', error = 'lease expired too many times'
+                                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""",
+                                 (now, self.max_attempts))
+                row = self._next_task(now, "kind != 'export'")
+                if row is None and not self._busy("kind != 'export'"):
+                    row = self._next_task(now, "kind = 'export'")
+                if row is not None:
+                    self._db.execute("""UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                        attempts = attempts + 1 WHERE id = ?""",
+                                     (worker, now + self.lease_seconds, row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return Task(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5] + 1)
+
+    def _next_task(self, now, kind_filter):
+        return self._db.execute(f"""SELECT id, kind, key, job, payload, attempts FROM tasks
+                                    WHERE {kind_filter} AND (status = 'pending'
+                                          OR (status = 'leased' AND lease_expires < ?))
+                                    ORDER BY id LIMIT 1""", (now,)).fetchone()
+
+    def _busy(self, kind_filter):
+        return self._db.execute(f"""SELECT COUNT(*) FROM tasks WHERE {kind_filter}
+                                    AND status IN ('pending', 'leased')""").fetchone()[0] > 0
+
+    def complete(self, task, result):
+        # A worker whose lease expired may still finish; the first completion wins.
+        with self._lock:
+            cursor = self._db.execute("""UPDATE tasks SET status = 'done', result = ?, lease_owner = NULL
+                                         WHERE id = ? AND status != 'done'""", (json.dumps(result), task.id))
+        return cursor.rowcount == 1
+
+    def fail(self, task, error, result=None):
+        status = "failed" if task.attempts >= self.max_attempts else "pending"
+        with self._lock:
+            self._db.execute("""UPDATE tasks SET status = ?, error = ?, result = ?, lease_owner = NULL
+                                WHERE id = ? AND status != 'done'""",
+                             (status, error, json.dumps(result), task.id))
+        log.warning(f"Task {task.key} failed (attempt {task.attempts}/{self.max_attempts}): {error}")
+
+    def result(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT result FROM tasks WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def results(self, kind, job):
+        with self._lock:
+            rows = self._db.execute("SELECT payload, result FROM tasks WHERE kind = ? AND job = ? ORDER BY id",
+                                    (kind, job)).fetchall()
+        return [(json.loads(payload), json.loads(result) if result is not None else None)
+                for payload, result in rows]
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def drained(self):
+        with self._lock:
+            return not self._busy("1")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
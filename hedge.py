@@ -0,0 +1,60 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metrics import Histogram
+log = logging.getLogger("retrieve_github")
+
+
+class Hedger:
+    # Decides when a slow request gets a backup copy on another proxy. The threshold is `delay`
+    # when given, otherwise the `quantile` of the latencies observed so far (default_delay until
+    # there are min_samples of them). Hedges are capped to max_extra_load times the requests sent.
+    # The requests of every hedged fetch run in one shared thread pool; its threads are started on
+    # demand, up to max_threads requests in flight.
+    def __init__(self, delay=None, quantile=0.9, max_hedges=1, max_extra_load=0.1, min_samples=20,
+                 default_delay=1.0, max_threads=64):
+        if max_hedges < 1 or not 0 < quantile < 1 or max_extra_load < 0 or max_threads < 2:
+            raise ValueError(f"Invalid hedging settings: max_hedges={max_hedges}, quantile={quantile}, "
+                             f"max_extra_load={max_extra_load}, max_threads={max_threads}")
+        self.fixed_delay = delay
+        self.quantile = quantile
+        self.max_hedges = max_hedges
+        self.max_extra_load = max_extra_load
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.requests = 0
+        self.hedges = 0
+        self._latencies = Histogram()
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="hedge")
+
+    def delay(self):
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        with self._lock:
+            if self._latencies.count < self.min_samples:
+                return self.default_delay
+            return self._latencies.quantile(self.quantile)
+
+    def observe(self, latency):
+        with self._lock:
+            self._latencies.observe(latency)
+
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def allow_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.max_extra_load * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def summary(self):
+        with self._lock:
+            return {"requests": self.requests, "hedges": self.hedges}
+
+    def close(self):
+        # Losing requests may still be on the wire; they finish in the background.
+        self.executor.shutdown(wait=False)
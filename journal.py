@@ -0,0 +1,74 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+log = logging.getLogger("retrieve_github")
+
+
+class CrawlJournal:
+    # Durable record of the work a crawl has finished: the parsed content of every search page and
+    # the record of every enriched repo. Each entry is committed as soon as it is done, so a crawl
+    # that dies can be resumed without fetching any of it again.
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.pages_reused = 0
+        self.repos_reused = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+                                job TEXT, page INTEGER, results TEXT, has_next INTEGER, done_at REAL,
+                                PRIMARY KEY (job, page))""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS repos (
+                                url TEXT PRIMARY KEY, record TEXT, done_at REAL)""")
+        if not resume:
+            self._db.execute("DELETE FROM pages")
+            self._db.execute("DELETE FROM repos")
+        self._db.commit()
+        if resume:
+            pages, repos = self.counts()
+            log.info(f"Resuming from {path}: {pages} search pages and {repos} repos already done")
+
+    @staticmethod
+    def job_key(type_, query, base_url):
+        return f"{type_.lower()}:{query}:{base_url}"
+
+    def counts(self):
+        with self._lock:
+            pages = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            repos = self._db.execute("SELECT COUNT(*) FROM repos").fetchone()[0]
+        return pages, repos
+
+    def get_page(self, job, page):
+        with self._lock:
+            row = self._db.execute("SELECT results, has_next FROM pages WHERE job = ? AND page = ?",
+                                   (job, page)).fetchone()
+            if row is None:
+                return None
+            self.pages_reused += 1
+        return json.loads(row[0]), bool(row[1])
+
+    def record_page(self, job, page, results, has_next):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                             (job, page, json.dumps(results), int(has_next), time.time()))
+            self._db.commit()
+
+    def get_repo(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT record FROM repos WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self.repos_reused += 1
+        return json.loads(row[0])
+
+    def record_repo(self, url, record):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO repos VALUES (?, ?, ?)", (url, json.dumps(record), time.time()))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,38 +1,42 @@
-from bs4 import BeautifulSoup
 import argparse
-from tqdm import tqdm
-from utils import *
+import itertools
 import logging
-import colorlog
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils import (ProxyLimiter, compact_jsonl, get_proxy_and_response, get_response, read_batch_jsonl,
+                   read_input_json, save_json, save_jsonl, typed_output_file)
+from parsing import (PARSER_BACKENDS, extract_languages_selectolax, extract_languages_streaming, get_parser_backend,
+                     has_next_page, languages_strainer, make_soup, search_strainer)
+from metrics import METRICS
+from journal import CrawlJournal
+from recrawl import RecrawlIndex, save_delta
+from frontier import Frontier
+from columnar import columnar_extension, save_columnar
 
 log = logging.getLogger("retrieve_github")
-log.setLevel(logging.DEBUG)
-log_file_name = f"log.txt"
-
-if os.path.exists(log_file_name):
-    os.remove(log_file_name)
-fileHandler = logging.FileHandler(log_file_name)
-handler = colorlog.StreamHandler()
-handler.setFormatter(
-    colorlog.ColoredFormatter(
-        "%(log_color)s%(levelname)-8s%(reset)s %(blue)s%(message)s",
-        log_colors={
-            'DEBUG':    'cyan',
-            'INFO':     'green',
-            'WARNING':  'yellow',
-            'ERROR':    'red',
-            'CRITICAL': 'red,bg_white',
-        },
-        secondary_log_colors={},
-        style='%'
-    )
-)
-log.addHandler(handler)
-log.addHandler(fileHandler)
-
-
-def get_extra_info(response):
-    soup = BeautifulSoup(response.content, 'html.parser')
+
+
+def progress(iterable, desc):
+    # tqdm is only imported once there is something to show a progress bar for.
+    from tqdm import tqdm
+    return tqdm(iterable, desc=desc)
+
+
+def get_extra_info(response, parser=None):
+    # parser is an InlineParser or a ParsePool; without one the page is parsed here with the auto backend.
+    if parser is not None:
+        return parser.parse_repo(response.content)
+    with METRICS.timer("parse_seconds", page="repo"):
+        return _get_extra_info(response.content)
+
+
+def _get_extra_info(content, backend=None):
+    if get_parser_backend(backend) == "selectolax":
+        return extract_languages_selectolax(content)
+    soup = make_soup(content, languages_strainer(), backend)
     languages = ["None"]
     percentages = ["0%"]
 
@@ -52,6 +56,9 @@ def get_extra_info(response):
     return languages, percentages
 
 
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+
 def search_repo(soup, base_url):
 
     repo_list = soup.find("ul", class_="repo-list")
@@ -59,21 +66,33 @@ def search_repo(soup, base_url):
         urls = []
         owners = []
         repos = repo_list.find_all("li")
-        for repo in tqdm(repos, desc="Retrieving repos info"):
+        for repo in progress(repos, "Retrieving repos info"):
             a_tag = repo.find("a")
             owners.append(a_tag["href"].split('/')[1])
             urls.append(base_url + a_tag["href"])
         return owners, urls
     else:
         log.error(f"Your search did not match any repositories.")
-        raise ValueError(f"Your search did not match any repositories.")
+        raise RuntimeError(f"Your search did not match any repositories.")
+
+
+def repo_updated_markers(soup):
+    # The "Updated ..." timestamp GitHub shows for every search result, None when it is missing.
+    markers = []
+    repo_list = soup.find("ul", class_="repo-list")
+    for repo in repo_list.find_all("li") if repo_list else []:
+        updated = repo.find("relative-time")
+        markers.append(updated.get("datetime") if updated else None)
+    return markers
 
 
 def search_issues(soup, base_url):
     issues_info = []
     issue_list = soup.find('div', {'id': 'issue_search_results'})
+    if issue_list is None:
+        return issues_info
     issues = issue_list.find_all('a', {'class': 'Link--muted color-fg-muted'})
-    for issue in tqdm(issues, desc="Retrieving issues info"):
+    for issue in progress(issues, "Retrieving issues info"):
         dict_issues = {}
         issue_number = issue.get_text(strip=True)
         issue_url = base_url + issue.get("href") + issue_number.replace('#', '/')
@@ -85,7 +104,9 @@ def search_issues(soup, base_url):
 def search_wikis(soup, base_url):
     wikis_info = []
     wikis_list = soup.find('div', {'id': 'wiki_search_results'})
-    for wikis in tqdm(wikis_list.find_all('div', class_='f4 text-normal'), desc="Retrieving wikis info"):
+    if wikis_list is None:
+        return wikis_info
+    for wikis in progress(wikis_list.find_all('div', class_='f4 text-normal'), "Retrieving wikis info"):
         dict_issues = {}
         wiki = wikis.find('a')
         link = wiki.get('href')
@@ -95,46 +116,324 @@ def search_wikis(soup, base_url):
     return wikis_info
 
 
-def get_extra(repos, owners, proxies, headers):
-    repo_info = []
-    for repo_url, owner in zip(repos, owners):
-        repo_dict = {}
-        log.info(f"Requesting info from: {repo_url}")
-        response = get_proxy_and_response(proxies, repo_url, headers)
-        languages, percentages = get_extra_info(response)
-        # output dict
-        repo_dict["url"] = repo_url
-        extra_dict = {}
-        extra_dict["owner"] = owner
-        extra_dict["language_stats"] = {}
-        for lan, per in zip(languages, percentages):
-            extra_dict["language_stats"][lan] = float(per.replace("%", ""))
-        repo_dict['extra'] = extra_dict
-        repo_info.append(repo_dict)
+def build_repo_record(repo_url, owner, response, stream_budget=None, updated=None, parser=None):
+    if stream_budget:
+        with METRICS.timer("parse_seconds", page="repo_streamed"):
+            languages, percentages, bytes_read = extract_languages_streaming(response, stream_budget)
+        METRICS.inc("response_bytes_total", bytes_read, proxy="streamed")
+        log.debug(f"Read {bytes_read} bytes from {repo_url}")
+    else:
+        languages, percentages = get_extra_info(response, parser)
+    # output dict
+    repo_dict = {"url": repo_url}
+    extra_dict = {}
+    extra_dict["owner"] = owner
+    extra_dict["language_stats"] = {}
+    for lan, per in zip(languages, percentages):
+        if per is None:
+            # A malformed page: the language is listed without its percentage.
+            raise ValueError(f"Missing percentage for language {lan}")
+        extra_dict["language_stats"][lan] = float(per.replace("%", ""))
+    repo_dict['extra'] = extra_dict
+    if updated is not None:
+        repo_dict['updated'] = updated
+    return repo_dict
+
+
+class RepoMemo:
+    # Shares enriched repos between the queries of a batch: a repo URL is fetched once, and a query
+    # asking for a URL another one is already fetching waits for that result instead.
+    def __init__(self):
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def get_or_enrich(self, repo_url, enrich):
+        with self._lock:
+            future = self._records.get(repo_url)
+            owner = future is None
+            if owner:
+                future = self._records[repo_url] = Future()
+            else:
+                self.hits += 1
+        if not owner:
+            return future.result()
+        record = enrich()
+        if "error" in record:
+            # Failures are not remembered, a later query gets another chance.
+            with self._lock:
+                del self._records[repo_url]
+        future.set_result(record)
+        return record
+
+
+def enrich_repo(repo_url, owner, proxies, headers, limiter=None, transport=None, stream_budget=None, memo=None,
+                journal=None, updated=None, recrawl=None, parser=None):
+    if memo is not None:
+        return memo.get_or_enrich(repo_url, lambda: enrich_repo(repo_url, owner, proxies, headers, limiter,
+                                                                transport, stream_budget, journal=journal,
+                                                                updated=updated, recrawl=recrawl, parser=parser))
+    if recrawl is not None:
+        record = recrawl.lookup(repo_url, updated)
+        if record is not None:
+            log.info(f"Unchanged since the previous snapshot: {repo_url}")
+            return record
+    if journal is not None:
+        record = journal.get_repo(repo_url)
+        if record is not None:
+            log.info(f"Already retrieved in a previous run: {repo_url}")
+            return record
+    log.info(f"Requesting info from: {repo_url}")
+    try:
+        response = get_proxy_and_response(proxies, repo_url, headers, limiter=limiter, transport=transport,
+                                          stream=bool(stream_budget))
+        record = build_repo_record(repo_url, owner, response, stream_budget, updated, parser)
+        if journal is not None:
+            journal.record_repo(repo_url, record)
+        return record
+    except Exception as err:
+        # A single unreachable repo must not abort the whole crawl.
+        log.error(f"Could not retrieve info from {repo_url}: {err}")
+        return {"url": repo_url, "extra": {"owner": owner, "language_stats": {}}, "error": str(err)}
+
+
+def iter_extra(repos, owners, proxies, headers, workers=1, max_per_proxy=None, transport=None, stream_budget=None,
+               memo=None, journal=None, updated=None, recrawl=None, parser=None):
+    if workers < 1:
+        raise ValueError(f"workers must be >= 1, got {workers}")
+    updated = updated or [None] * len(repos)
+    if workers == 1:
+        for repo_url, owner, repo_updated in zip(repos, owners, updated):
+            yield enrich_repo(repo_url, owner, proxies, headers, transport=transport, stream_budget=stream_budget,
+                              memo=memo, journal=journal, updated=repo_updated, recrawl=recrawl, parser=parser)
+        return
+
+    limiter = ProxyLimiter(max_per_proxy) if max_per_proxy else None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # executor.map keeps the results in the same order as the input repos and hands each one
+        # over as soon as it and all the ones before it are done.
+        yield from executor.map(lambda args: enrich_repo(args[0], args[1], proxies, headers, limiter, transport,
+                                                         stream_budget, memo, journal, args[2], recrawl, parser),
+                                zip(repos, owners, updated))
+
+
+def log_failed_enrichments(records):
+    failed = sum(1 for record in records if "error" in record)
+    if failed:
+        log.warning(f"{failed}/{len(records)} repositories could not be enriched")
+
+
+def get_extra(repos, owners, proxies, headers, workers=1, max_per_proxy=None, transport=None, stream_budget=None,
+              journal=None, parser=None):
+    repo_info = list(iter_extra(repos, owners, proxies, headers, workers, max_per_proxy, transport, stream_budget,
+                                journal=journal, parser=parser))
+    log_failed_enrichments(repo_info)
     return repo_info
 
 
-def search(query, proxies, type_):
-    base_url = "https://github.com"
-    headers = {'User-Agent': 'Mozilla/5.0'}
+def parse_search_page(content, type_, base_url, parser=None):
+    if parser is not None:
+        return parser.parse_search(content, type_, base_url)
+    with METRICS.timer("parse_seconds", page="search"):
+        return _parse_search_page(content, type_, base_url)
+
+
+def _parse_search_page(content, type_, base_url, backend=None):
+    soup = make_soup(content, search_strainer(type_), backend)
+    # 3 different retrievers since the requested data vary a lot.
+    if type_.lower() == "repositories":
+        owners, urls = search_repo(soup, base_url)
+        return owners, urls, repo_updated_markers(soup)
+    elif type_.lower() == "issues":
+        return search_issues(soup, base_url)
+    return search_wikis(soup, base_url)
+
+
+def iter_search(query, proxies, type_, workers=1, max_per_proxy=None, transport=None, max_pages=1,
+                max_results=None, stream_budget=None, memo=None, base_url="https://github.com", journal=None,
+                recrawl=None, parser=None):
+    headers = HEADERS
 
     # Retrieve info:
-    if type_.lower() in ["repositories", "issues", "wikis"]:
-        # 3 different retrievers since the requested data vary a lot.
-        response = get_response(type_, query, proxies, headers, base_url)
-        soup = BeautifulSoup(response.content, "html.parser")
-        if type_.lower() == "repositories":
-            owners, urls = search_repo(soup, base_url)
-            list_repo = get_extra(urls, owners, proxies, headers)
-            return list_repo
-        elif type_.lower() == "issues":
-            list_issues = search_issues(soup, base_url)
-            return list_issues
-        elif type_.lower() == "wikis":
-            list_wikis = search_wikis(soup, base_url)
-            return list_wikis
-    else:
+    if type_.lower() not in ["repositories", "issues", "wikis"]:
         raise ValueError(f"Invalid type_: {type_}")
+    if transport is None:
+        from transport import Transport
+        # Search pages and repo pages share the same keep-alive connections.
+        with Transport(pool_maxsize=max(workers, 1)) as own_transport:
+            yield from iter_search(query, proxies, type_, workers, max_per_proxy, own_transport, max_pages,
+                                   max_results, stream_budget, memo, base_url, journal, recrawl, parser)
+        return
+
+    job = CrawlJournal.job_key(type_, query, base_url)
+    yielded = 0
+    for page in range(1, max_pages + 1):
+        remaining = None if max_results is None else max_results - yielded
+        if remaining is not None and remaining <= 0:
+            break
+        done = journal.get_page(job, page) if journal is not None else None
+        if done is not None:
+            log.info(f"Search results page {page} already retrieved in a previous run")
+            parsed, next_page = done
+        else:
+            log.info(f"Retrieving search results page {page}")
+            response = get_response(type_, query, proxies, headers, base_url, transport, page)
+            try:
+                parsed = parse_search_page(response.content, type_, base_url, parser)
+            except RuntimeError:
+                if page == 1:
+                    raise
+                break
+            next_page = has_next_page(response.content)
+            if journal is not None:
+                journal.record_page(job, page, parsed, next_page)
+        if type_.lower() == "repositories":
+            owners, urls, updated = parsed
+            records = iter_extra(urls[:remaining], owners[:remaining], proxies, headers, workers, max_per_proxy,
+                                 transport, stream_budget, memo, journal, updated[:remaining], recrawl, parser)
+        else:
+            records = parsed[:remaining]
+
+        page_count = 0
+        for record in records:
+            page_count += 1
+            yield record
+        yielded += page_count
+        if page_count == 0 or not next_page:
+            break
+
+
+def search(query, proxies, type_, workers=1, max_per_proxy=None, transport=None, max_pages=1, max_results=None,
+           stream_budget=None, memo=None, base_url="https://github.com", journal=None, recrawl=None, parser=None):
+    retrieved_info = list(iter_search(query, proxies, type_, workers, max_per_proxy, transport, max_pages,
+                                      max_results, stream_budget, memo, base_url, journal, recrawl, parser))
+    log_failed_enrichments(retrieved_info)
+    return retrieved_info
+
+
+def job_output_file(output_file, job_id):
+    base_name, extension = os.path.splitext(output_file)
+    return f"{base_name}_{job_id}{extension}"
+
+
+def output_extension(output_format):
+    if output_format == 'columnar':
+        return columnar_extension()
+    return '.jsonl' if output_format == 'jsonl' else '.json'
+
+
+def save_output(records, output_file, type_, output_format, append_output, flush_every=100):
+    if output_format == 'jsonl':
+        return save_jsonl(records, output_file, type_, append_output, flush_every)
+    if output_format == 'columnar':
+        return save_columnar(records, output_file, type_, append_output)
+    return save_json(records, output_file, type_, append_output)
+
+
+def run_job(crawler, keywords, type_, output_file, args, memo=None, journal=None):
+    recrawl = None
+    append_output = args.append_output
+    if args.incremental:
+        # The previous output of the job is the snapshot to compare against, and is replaced by the new one.
+        recrawl = RecrawlIndex.from_file(typed_output_file(output_file, type_, output_extension(args.output_format)))
+        append_output = False
+    # Records are written as soon as they are retrieved instead of being collected first.
+    retrieved_info = crawler.iter_search(keywords, type_, memo, journal, recrawl)
+    if recrawl is not None:
+        retrieved_info = recrawl.track(retrieved_info)
+    snapshot_file = save_output(retrieved_info, output_file, type_, args.output_format, append_output,
+                                args.flush_every)
+    if recrawl is not None:
+        log.info(f"Reused {recrawl.reused} unchanged repos from the previous snapshot")
+        save_delta(recrawl.delta(), snapshot_file)
+    return snapshot_file
+
+
+def seed_frontier(frontier, jobs, args):
+    # Every worker seeds the same jobs, the frontier keeps only the first copy of each task.
+    for job in jobs:
+        job_id = job['id'] or 'input'
+        frontier.add("search", f"search:{job_id}:1",
+                     {"query": '+'.join(job['keywords']), "type": job['type'], "page": 1,
+                      "max_pages": args.max_pages, "base_url": "https://github.com"}, job_id)
+        output_file = job.get('output_file') or job_output_file(args.output_file, job['id'])
+        frontier.add("export", f"export:{job_id}",
+                     {"output_file": output_file, "type": job['type'], "max_results": args.max_results,
+                      "output_format": args.output_format, "append_output": args.append_output}, job_id)
+
+
+def frontier_job_records(frontier, job):
+    # The records of a job in search result order, put together from its search and repo tasks.
+    for payload, result in frontier.results("search", job):
+        if result is None:
+            continue
+        if "urls" not in result:
+            yield from result["records"]
+            continue
+        for repo_url in result["urls"]:
+            record = frontier.result(f"repo:{repo_url}")
+            if record is not None:
+                yield record
+
+
+def process_frontier_task(frontier, task, proxies, transport, stream_budget=None, limiter=None, parser=None):
+    payload = task.payload
+    if task.kind == "search":
+        log.info(f"Retrieving search results page {payload['page']} of {task.job}")
+        response = get_response(payload["type"], payload["query"], proxies, HEADERS, payload["base_url"],
+                                transport, payload["page"])
+        try:
+            parsed = parse_search_page(response.content, payload["type"], payload["base_url"], parser)
+        except RuntimeError:
+            return {"records": []}
+        if payload["page"] < payload["max_pages"] and has_next_page(response.content):
+            next_page = payload["page"] + 1
+            frontier.add("search", f"search:{task.job}:{next_page}", dict(payload, page=next_page), task.job)
+        if payload["type"].lower() != "repositories":
+            return {"records": parsed}
+        owners, urls, updated = parsed
+        for repo_url, owner, repo_updated in zip(urls, owners, updated):
+            # Repos found by several jobs are enriched once.
+            frontier.add("repo", f"repo:{repo_url}", {"url": repo_url, "owner": owner, "updated": repo_updated})
+        return {"urls": urls}
+    if task.kind == "repo":
+        return enrich_repo(payload["url"], payload["owner"], proxies, HEADERS, limiter, transport, stream_budget,
+                           updated=payload["updated"], parser=parser)
+    records = itertools.islice(frontier_job_records(frontier, task.job), payload["max_results"])
+    output_file = save_output(records, payload["output_file"], payload["type"], payload["output_format"],
+                              payload["append_output"])
+    log.info(f"SUCCESS: Output file saved: {output_file}")
+    return {"output_file": output_file}
+
+
+def run_frontier_worker(frontier, worker_id, proxies, transport, workers=1, max_per_proxy=None, stream_budget=None,
+                        poll_interval=1.0, parser=None):
+    # Leases tasks until the frontier is drained, with `workers` threads. Returns the number of tasks done.
+    limiter = ProxyLimiter(max_per_proxy) if max_per_proxy and workers > 1 else None
+
+    def work(name):
+        done = 0
+        while True:
+            task = frontier.lease(name)
+            if task is None:
+                if frontier.drained():
+                    return done
+                # Other workers still hold leases, their tasks may add more work or expire.
+                time.sleep(poll_interval)
+                continue
+            try:
+                result = process_frontier_task(frontier, task, proxies, transport, stream_budget, limiter, parser)
+            except Exception as err:
+                frontier.fail(task, str(err))
+                continue
+            if "error" in result:
+                frontier.fail(task, result["error"], result)
+            else:
+                frontier.complete(task, result)
+            done += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(work, [f"{worker_id}-{i}" for i in range(workers)]))
 
 
 def main(): # pragma: no cover
@@ -143,11 +442,125 @@ def main(): # pragma: no cover
     parser.add_argument('--input_file', type=str, help='Path to the input JSON file', default='input.json')
     parser.add_argument('--output_file', type=str, help='Path to the output JSON file', default='output.json')
     parser.add_argument('-append_output', action='store_true', help='If true retrieved data is appended to the output file (if exists), by default output file is replaced')
+    parser.add_argument('--workers', type=int, help='Number of repositories enriched concurrently', default=1)
+    parser.add_argument('--max_per_proxy', type=int, help='Maximum concurrent requests through a single proxy (only used with --workers > 1)', default=None)
+    parser.add_argument('--proxy_health_file', type=str, help='Path to the file where proxy health is kept between runs', default='proxy_health.json')
+    parser.add_argument('--pool_connections', type=int, help='Number of connection pools cached per proxy session', default=4)
+    parser.add_argument('--pool_maxsize', type=int, help='Maximum keep-alive connections per host and proxy', default=10)
+    parser.add_argument('--cache_file', type=str, help='Path to the on-disk response cache (disabled if not given)', default=None)
+    parser.add_argument('--cache_ttl', type=int, help='Seconds a cached response is used without revalidation', default=6 * 3600)
+    parser.add_argument('--cache_max_mb', type=int, help='Maximum size of the response cache in MB', default=256)
+    parser.add_argument('--max_pages', type=int, help='Maximum number of search result pages to crawl', default=1)
+    parser.add_argument('--max_results', type=int, help='Maximum number of results to retrieve (all by default)', default=None)
+    parser.add_argument('--output_format', type=str, choices=['json', 'jsonl', 'columnar'], help='json writes a JSON array, jsonl appends one record per line, columnar writes interned language ids and float32 percentages to Parquet (needs pyarrow) or .npz (needs numpy)', default='json')
+    parser.add_argument('--flush_every', type=int, help='Number of records between flushes of a jsonl output', default=100)
+    parser.add_argument('--compact', type=str, metavar='JSONL_FILE', help='Deduplicate a jsonl output by url into a sorted snapshot and exit', default=None)
+    parser.add_argument('--compact_output', type=str, help='Destination of --compact (.jsonl or .json), the input file by default', default=None)
+    parser.add_argument('--parser', type=str, choices=PARSER_BACKENDS, help='HTML parser backend, auto picks lxml when installed', default='auto')
+    parser.add_argument('--stream_budget_kb', type=int, help='Stream repo pages and stop reading once the languages are found; a page whose languages are not found within this many KB is an error (disabled by default)', default=None)
+    parser.add_argument('--batch_file', type=str, help='Path to a JSONL file with one search job per line, run in a single process', default=None)
+    parser.add_argument('--metrics_file', type=str, help='Path to the JSON summary of the run metrics', default='metrics.json')
+    parser.add_argument('--prometheus_file', type=str, help='Also export the run metrics in the Prometheus text format to this file', default=None)
+    parser.add_argument('--rate_limit', type=float, help='Maximum requests per second to a host (unlimited by default)', default=None)
+    parser.add_argument('--rate_burst', type=int, help='Number of requests that may exceed --rate_limit in a burst', default=1)
+    parser.add_argument('--throttle_retries', type=int, help='Times a throttled (429/abuse detection) request is retried after backing off', default=3)
+    parser.add_argument('--journal_file', type=str, help='Path to the crawl journal used to resume an interrupted run (not used with --frontier)', default='crawl_journal.sqlite')
+    parser.add_argument('--resume', action='store_true', help='Skip the search pages and repos already completed in the journal and merge them into the output')
+    parser.add_argument('--incremental', action='store_true', help='Reuse the records of repos unchanged since the previous output and also write the delta (added/changed/removed)')
+    parser.add_argument('--frontier', type=str, help='Path to a shared work queue; every process started with the same file works on the same crawl', default=None)
+    parser.add_argument('--lease_seconds', type=float, help='Seconds after which a task of a dead frontier worker is handed to another one', default=300)
+    parser.add_argument('--max_hedges', type=int, help='Backup requests sent through other proxies when a request is slow (0 disables hedging)', default=0)
+    parser.add_argument('--hedge_delay', type=float, help='Seconds without an answer before hedging, the p90 of the observed latencies by default', default=None)
+    parser.add_argument('--hedge_budget', type=float, help='Maximum hedged requests as a fraction of all requests', default=0.1)
+    parser.add_argument('--parse_processes', type=int, help='Parse pages in this many worker processes while the other fetcher threads keep downloading, needs --workers 2 or more (0 parses in the fetcher threads)', default=0)
+    parser.add_argument('--skip_probe', action='store_true', help='Do not probe the proxies before the crawl')
+    parser.add_argument('--probe_timeout', type=float, help='Seconds a proxy has to answer the startup probe', default=2.0)
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Run as a daemon that accepts search jobs on this port and streams the records back as NDJSON', default=None)
+    parser.add_argument('--serve_host', type=str, help='Address the daemon listens on', default='127.0.0.1')
+    parser.add_argument('--max_jobs', type=int, help='Search jobs the daemon runs at the same time', default=2)
+    parser.add_argument('--max_queued_jobs', type=int, help='Search jobs the daemon keeps waiting before refusing new ones', default=8)
     args = parser.parse_args()
-    keywords, proxies, type_ = read_input_json(args.input_file)
-    retrieved_info = search('+'.join(keywords), proxies, type_)
-    output_file = save_json(retrieved_info, args.output_file, type_, args.append_output)
-    log.info(f"SUCCESS: Output file saved: {output_file}")
+    # Imported here so that the crawl functions above can be imported without the library API.
+    from crawler import CrawlConfig, Crawler, NetworkConfig, configure_logging
+    configure_logging()
+    if args.compact:
+        output_file = compact_jsonl(args.compact, args.compact_output)
+        log.info(f"SUCCESS: Compacted file saved: {output_file}")
+        return
+    if args.batch_file:
+        jobs = read_batch_jsonl(args.batch_file)
+        proxies = list(dict.fromkeys(proxy for job in jobs for proxy in job.get('proxies', [])))
+        if not proxies:
+            _, proxies, _ = read_input_json(args.input_file)
+    else:
+        keywords, proxies, type_ = read_input_json(args.input_file)
+        jobs = [{'id': None, 'keywords': keywords, 'type': type_, 'output_file': args.output_file}]
+    config = CrawlConfig(workers=args.workers, max_per_proxy=args.max_per_proxy, max_pages=args.max_pages,
+                         max_results=args.max_results, stream_budget_kb=args.stream_budget_kb, parser=args.parser,
+                         parse_processes=args.parse_processes)
+    cache_file = args.cache_file
+    if args.serve is not None and cache_file is None:
+        # The daemon always keeps a response cache, in memory unless a file is given.
+        cache_file = ":memory:"
+    network = NetworkConfig(pool_connections=args.pool_connections, pool_maxsize=args.pool_maxsize,
+                            proxy_health_file=args.proxy_health_file, cache_file=cache_file,
+                            cache_ttl=args.cache_ttl, cache_max_mb=args.cache_max_mb, rate_limit=args.rate_limit,
+                            rate_burst=args.rate_burst, throttle_retries=args.throttle_retries,
+                            max_hedges=args.max_hedges, hedge_delay=args.hedge_delay, hedge_budget=args.hedge_budget,
+                            probe_timeout=args.probe_timeout)
+    crawler = Crawler(proxies, config, network)
+    if not args.skip_probe:
+        crawler.warm_up()
+    if args.serve is not None:
+        from server import serve
+        try:
+            serve(crawler, args.serve_host, args.serve, args.max_jobs, args.max_queued_jobs)
+        finally:
+            crawler.close()
+        return
+    memo = RepoMemo() if args.batch_file else None
+    # The frontier keeps its own record of the finished work, the journal is only used by the jobs loop.
+    journal = None
+    run_start = time.monotonic()
+    try:
+        if args.frontier:
+            frontier = Frontier(args.frontier, lease_seconds=args.lease_seconds)
+            seed_frontier(frontier, jobs, args)
+            worker_id = f"{socket.gethostname()}-{os.getpid()}"
+            done = run_frontier_worker(frontier, worker_id, crawler.pool, crawler.transport, args.workers,
+                                       args.max_per_proxy, crawler.stream_budget, parser=crawler.parser)
+            log.info(f"Frontier worker {worker_id} did {done} tasks, frontier: {frontier.counts()}")
+            frontier.close()
+        else:
+            journal = CrawlJournal(args.journal_file, resume=args.resume)
+            for job in jobs:
+                output_file = job.get('output_file') or job_output_file(args.output_file, job['id'])
+                try:
+                    output_file = run_job(crawler, job['keywords'], job['type'], output_file, args, memo, journal)
+                except Exception as err:
+                    if not args.batch_file:
+                        raise
+                    # One failing query must not stop the rest of the batch.
+                    log.error(f"Job {job['id']} failed: {err}")
+                    continue
+                log.info(f"SUCCESS: Output file saved: {output_file}")
+    finally:
+        crawler.close()
+        if journal is not None:
+            journal.close()
+    if journal is not None and args.resume:
+        log.info(f"Resume summary: {journal.pages_reused} search pages and {journal.repos_reused} repos "
+                 f"taken from {args.journal_file}")
+    if memo is not None:
+        log.info(f"Batch summary: {len(jobs)} jobs, {memo.hits} repo fetches saved by cross-query dedup")
+    run_info = dict({"elapsed_seconds": round(time.monotonic() - run_start, 3)}, **crawler.summary())
+    if "cache" in run_info:
+        summary = run_info["cache"]
+        log.info(f"Cache summary: {summary['hits']} hits, {summary['misses']} misses, "
+                 f"{summary['revalidated']} revalidated (304)")
+    log.info(f"Run metrics saved: {METRICS.write_json(args.metrics_file, run_info)}")
+    if args.prometheus_file:
+        log.info(f"Prometheus metrics saved: {METRICS.write_prometheus(args.prometheus_file)}")
 
 
 if __name__ == '__main__':
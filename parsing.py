@@ -0,0 +1,229 @@
+import codecs
+import functools
+import importlib.util
+import logging
+import re
+from html.parser import HTMLParser
+log = logging.getLogger("retrieve_github")
+
+PARSER_BACKENDS = ["auto", "html.parser", "lxml", "selectolax"]
+
+_NEXT_PAGE = re.compile(rb'<a\b[^>]*\brel="next"')
+
+
+class TruncatedPage(RuntimeError):
+    # The byte budget ran out before the language list was complete: the page is not "without
+    # languages", it was only partly read.
+    pass
+
+
+def _is_installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def available_backends():
+    return [backend for backend in PARSER_BACKENDS[1:] if backend == "html.parser" or _is_installed(backend)]
+
+
+def check_parser_backend(backend):
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Invalid parser backend: {backend}. Supported backends are {PARSER_BACKENDS}")
+    if backend != "auto" and backend not in available_backends():
+        raise ValueError(f"Parser backend {backend} is not installed")
+
+
+def get_parser_backend(backend=None):
+    # There is no process-wide setting: every caller passes its own backend, None meaning auto.
+    if backend is None or backend == "auto":
+        return "lxml" if _is_installed("lxml") else "html.parser"
+    return backend
+
+
+def bs4_parser(backend=None):
+    # selectolax only covers the repo pages; everything else still goes through BeautifulSoup.
+    backend = get_parser_backend(backend)
+    if backend == "selectolax":
+        return "lxml" if _is_installed("lxml") else "html.parser"
+    return backend
+
+
+def make_soup(markup, parse_only=None, backend=None):
+    # bs4 is imported on first use, it is the slowest import of the crawler.
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markup, bs4_parser(backend), parse_only=parse_only)
+
+
+# Targeted parsing: only the subtrees each extractor reads are built, the rest of the page is skipped.
+@functools.lru_cache(maxsize=None)
+def languages_strainer():
+    from bs4 import SoupStrainer
+    return SoupStrainer(["h2", "li"])
+
+
+@functools.lru_cache(maxsize=None)
+def search_strainer(type_):
+    from bs4 import SoupStrainer
+    return {
+        "repositories": SoupStrainer("ul", class_="repo-list"),
+        "issues": SoupStrainer("div", id="issue_search_results"),
+        "wikis": SoupStrainer("div", id="wiki_search_results"),
+    }[type_.lower()]
+
+
+def has_next_page(content):
+    # Cheap check on the raw page so that the pagination does not have to be parsed.
+    return _NEXT_PAGE.search(content) is not None
+
+
+def _selectolax_parser():
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+        return HTMLParser
+
+
+def _is_tag(node):
+    return node is not None and node.tag not in ("-text", "-comment", "_comment")
+
+
+def _next_tag(node):
+    # Same as BeautifulSoup's Tag.find_next(): the next tag in document order.
+    child = node.child
+    while child is not None:
+        if _is_tag(child):
+            return child
+        child = child.next
+    while node is not None:
+        sibling = node.next
+        while sibling is not None:
+            if _is_tag(sibling):
+                return sibling
+            sibling = sibling.next
+        node = node.parent
+    return None
+
+
+def _string(node):
+    # Same as BeautifulSoup's Tag.string: the text of a tag that has a single child.
+    children = list(node.iter(include_text=True))
+    if len(children) != 1:
+        return None
+    if _is_tag(children[0]):
+        return _string(children[0])
+    return children[0].text_content
+
+
+def extract_languages_selectolax(content):
+    tree = _selectolax_parser()(content)
+    languages = ["None"]
+    percentages = ["0%"]
+    if any(_string(h2) == "Languages" for h2 in tree.css("h2")):
+        languages = []
+        percentages = []
+        for item in tree.css("li.d-inline"):
+            for span in item.css("span"):
+                if span.attributes.get("class") == "color-fg-default text-bold mr-1":
+                    languages.append(span.text(strip=True))
+                    next_tag = _next_tag(span)
+                    percentages.append(_string(next_tag) if next_tag is not None else None)
+                    break
+    return languages, percentages
+
+
+class LanguageStatsParser(HTMLParser):
+    # Incremental version of get_extra_info's extraction: it is fed the repo page chunk by chunk
+    # and flags `done` as soon as the element holding the "Languages" heading is closed.
+    VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                     "source", "track", "wbr"}
+    LANGUAGE_CLASS = "color-fg-default text-bold mr-1"
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.languages = []
+        self.percentages = []
+        self.found_heading = False
+        self.done = False
+        self._depth = 0
+        self._section_depth = None
+        self._h2_text = None
+        self._li_depth = None
+        self._language_text = None
+        self._language_depth = None
+        self._await_percentage = False
+        self._percentage_text = None
+        self._percentage_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        if self._await_percentage:
+            self._await_percentage = False
+            self._percentage_text = []
+            self._percentage_depth = self._depth
+        if tag == "h2" and not self.found_heading:
+            self._h2_text = []
+            self._section_depth = self._depth - 1
+        elif tag == "li" and "d-inline" in (attrs.get("class") or "").split():
+            self._li_depth = self._depth
+        elif tag == "span" and self._li_depth is not None and attrs.get("class") == self.LANGUAGE_CLASS:
+            self._language_text = []
+            self._language_depth = self._depth
+        if tag not in self.VOID_ELEMENTS:
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if self.done or tag in self.VOID_ELEMENTS:
+            return
+        self._depth -= 1
+        if tag == "h2" and self._h2_text is not None:
+            self.found_heading = "".join(self._h2_text) == "Languages"
+            self._h2_text = None
+        elif self._language_depth == self._depth:
+            self.languages.append("".join(text.strip() for text in self._language_text))
+            self._language_text = None
+            self._language_depth = None
+            self._await_percentage = True
+        elif self._percentage_depth == self._depth:
+            self.percentages.append("".join(self._percentage_text))
+            self._percentage_text = None
+            self._percentage_depth = None
+        if self._li_depth == self._depth:
+            self._li_depth = None
+        if self.found_heading and self._depth <= self._section_depth:
+            self.done = True
+
+    def handle_data(self, data):
+        for text in (self._h2_text, self._language_text, self._percentage_text):
+            if text is not None:
+                text.append(data)
+
+    def result(self):
+        if not self.found_heading:
+            return ["None"], ["0%"]
+        percentages = self.percentages + [None] * (len(self.languages) - len(self.percentages))
+        return self.languages, percentages
+
+
+def extract_languages_streaming(response, byte_budget, chunk_size=16 * 1024):
+    # Reads the body only until the language list is complete or byte_budget bytes were read, then
+    # closes the connection. Returns the extracted lists and the number of bytes actually read, and
+    # raises TruncatedPage when the budget ran out first.
+    parser = LanguageStatsParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    bytes_read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            bytes_read += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.done:
+                break
+            if bytes_read >= byte_budget:
+                raise TruncatedPage(f"Byte budget of {byte_budget} bytes exceeded before the language list "
+                                    f"was complete")
+    finally:
+        response.close()
+    languages, percentages = parser.result()
+    return languages, percentages, bytes_read
@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from metrics import METRICS
+from parsing import check_parser_backend, get_parser_backend
+log = logging.getLogger("retrieve_github")
+
+
+def _parse_repo(content, backend):
+    # Runs in a worker process; main is cheap to import there since it defers its heavy imports.
+    import main
+    start = time.perf_counter()
+    return main._get_extra_info(content, backend), time.perf_counter() - start
+
+
+def _parse_search(content, type_, base_url, backend):
+    import main
+    start = time.perf_counter()
+    return main._parse_search_page(content, type_, base_url, backend), time.perf_counter() - start
+
+
+class InlineParser:
+    # Parses pages in the calling thread with its own backend, so crawlers with different parser
+    # settings can share a process. ParsePool has the same interface.
+    def __init__(self, backend="auto"):
+        check_parser_backend(backend)
+        self.backend = backend
+
+    def parse_repo(self, content):
+        import main
+        with METRICS.timer("parse_seconds", page="repo"):
+            return main._get_extra_info(content, self.backend)
+
+    def parse_search(self, content, type_, base_url):
+        import main
+        with METRICS.timer("parse_seconds", page="search"):
+            return main._parse_search_page(content, type_, base_url, self.backend)
+
+    def close(self):
+        pass
+
+
+class ParsePool:
+    # Parses pages in worker processes, so parsing uses all cores while the other fetcher threads
+    # keep downloading. Every fetcher holds at most one raw page. At most max_pending pages are
+    # copied into the pool; a fetcher that would go over it blocks until a slot frees up, so the
+    # pool's copies stay bounded however many fetchers or jobs share it.
+    def __init__(self, processes=None, max_pending=None, backend=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.processes
+        if self.processes < 1 or self.max_pending < 1:
+            raise ValueError(f"Invalid parse pool settings: processes={self.processes}, "
+                             f"max_pending={self.max_pending}")
+        if backend is not None:
+            check_parser_backend(backend)
+        self.backend = get_parser_backend(backend)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        log.info(f"Parsing pages in {self.processes} processes")
+
+    def _run(self, page, function, *args):
+        with METRICS.timer("parse_queue_seconds", page=page):
+            self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        result, elapsed = future.result()
+        METRICS.observe("parse_seconds", elapsed, page=page)
+        return result
+
+    def parse_repo(self, content):
+        return self._run("repo", _parse_repo, content, self.backend)
+
+    def parse_search(self, content, type_, base_url):
+        return self._run("search", _parse_search, content, type_, base_url, self.backend)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
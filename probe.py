@@ -0,0 +1,52 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from metrics import METRICS
+log = logging.getLogger("retrieve_github")
+
+# Small static file, so a probe costs one round trip and almost no bandwidth.
+PROBE_URL = "https://github.com/robots.txt"
+
+
+def probe_proxy(transport, proxy, url=PROBE_URL, timeout=2.0):
+    import requests
+    start = time.monotonic()
+    try:
+        response = transport.get(proxy, url, {'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as err:
+        return {"proxy": proxy, "reachable": False, "error": str(err)}
+    return {"proxy": proxy, "reachable": True, "latency": round(time.monotonic() - start, 4),
+            "status": response.status_code}
+
+
+def warm_up(pool, transport, url=PROBE_URL, timeout=2.0, max_workers=32):
+    # Probes every proxy of the pool concurrently before the crawl starts. Reachable proxies are
+    # ranked by latency and keep the connection the probe opened; the others are dropped from the
+    # rotation (unless none is reachable, then all are kept and the crawl finds out the slow way).
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(pool), max_workers)))
+    futures = {executor.submit(probe_proxy, transport, proxy, url, timeout): proxy for proxy in pool}
+    # requests applies the timeout to the connect and to every read, so a probe can take longer.
+    done, not_done = wait(futures, timeout=2 * timeout)
+    executor.shutdown(wait=False)
+    results = [future.result() for future in done]
+    results += [{"proxy": futures[future], "reachable": False, "error": "deadline exceeded"} for future in not_done]
+
+    for result in results:
+        proxy = result["proxy"]
+        if result["reachable"]:
+            METRICS.inc("proxy_probes_total", proxy=proxy, outcome="reachable")
+            METRICS.observe("proxy_probe_seconds", result["latency"], proxy=proxy)
+            pool.record_success(proxy, result["latency"])
+        else:
+            METRICS.inc("proxy_probes_total", proxy=proxy, outcome="unreachable")
+            pool.record_failure(proxy)
+    results.sort(key=lambda result: (not result["reachable"], result.get("latency", 0.0)))
+    reachable = [result["proxy"] for result in results if result["reachable"]]
+    if reachable:
+        pool.retain(reachable)
+        log.info(f"{len(reachable)}/{len(results)} proxies reachable, fastest: {reachable[0]} "
+                 f"({results[0]['latency'] * 1000:.0f} ms)")
+    else:
+        log.error(f"None of the {len(results)} proxies answered the probe within {timeout}s, keeping all of them")
+    return results
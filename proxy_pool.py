@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+log = logging.getLogger("retrieve_github")
+
+
+class ProxyPool:
+    # Remembers how every proxy behaved so that fast, healthy proxies are tried first and dead
+    # ones are quarantined (with an exponential cool-off) instead of costing a timeout per URL.
+    def __init__(self, proxies, health_file=None, alpha=0.3, base_cooloff=30.0, max_cooloff=1800.0,
+                 default_latency=2.0):
+        if not proxies:
+            raise ValueError("ProxyPool needs at least one proxy")
+        self.proxies = list(dict.fromkeys(proxies))
+        self.health_file = health_file
+        self.alpha = alpha
+        self.base_cooloff = base_cooloff
+        self.max_cooloff = max_cooloff
+        self.default_latency = default_latency
+        self._lock = threading.Lock()
+        self._stats = {proxy: self._new_stats() for proxy in self.proxies}
+        if health_file:
+            self.load()
+
+    @staticmethod
+    def _new_stats():
+        return {"latency": None, "success_rate": 1.0, "attempts": 0, "successes": 0,
+                "consecutive_failures": 0, "quarantined_until": 0.0}
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def __iter__(self):
+        return iter(self.proxies)
+
+    def retain(self, proxies):
+        # Narrows the rotation down to `proxies`, in that order. The health of the others is still
+        # saved, so they are not forgotten for the next run.
+        with self._lock:
+            self.proxies = [proxy for proxy in dict.fromkeys(proxies) if proxy in self._stats]
+
+    def stats(self, proxy):
+        with self._lock:
+            return dict(self._stats[proxy])
+
+    def is_quarantined(self, proxy, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._stats[proxy]["quarantined_until"] > now
+
+    def _expected_cost(self, stats):
+        # Seconds we expect to spend per successful request through this proxy.
+        latency = stats["latency"] if stats["latency"] is not None else self.default_latency
+        return latency / max(stats["success_rate"], 0.05)
+
+    def candidates(self):
+        # Healthy proxies come first, drawn by a weighted shuffle so the load still spreads
+        # across comparable proxies; quarantined ones follow, soonest-to-recover first.
+        now = time.time()
+        with self._lock:
+            healthy = [p for p in self.proxies if self._stats[p]["quarantined_until"] <= now]
+            quarantined = sorted((p for p in self.proxies if self._stats[p]["quarantined_until"] > now),
+                                 key=lambda p: self._stats[p]["quarantined_until"])
+            weights = {p: 1.0 / self._expected_cost(self._stats[p]) for p in healthy}
+        # Weighted sampling without replacement (Efraimidis-Spirakis keys).
+        healthy.sort(key=lambda p: random.random() ** (1.0 / weights[p]), reverse=True)
+        return healthy + quarantined
+
+    def record_success(self, proxy, latency):
+        with self._lock:
+            stats = self._stats[proxy]
+            stats["attempts"] += 1
+            stats["successes"] += 1
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] = self.alpha * latency + (1 - self.alpha) * stats["latency"]
+            stats["success_rate"] = self.alpha + (1 - self.alpha) * stats["success_rate"]
+            stats["consecutive_failures"] = 0
+            stats["quarantined_until"] = 0.0
+
+    def record_failure(self, proxy):
+        with self._lock:
+            stats = self._stats[proxy]
+            stats["attempts"] += 1
+            stats["success_rate"] = (1 - self.alpha) * stats["success_rate"]
+            stats["consecutive_failures"] += 1
+            cooloff = min(self.base_cooloff * 2 ** (stats["consecutive_failures"] - 1), self.max_cooloff)
+            stats["quarantined_until"] = time.time() + cooloff
+        log.warning(f"Proxy {proxy} quarantined for {cooloff:.0f}s")
+
+    def load(self):
+        if not os.path.exists(self.health_file):
+            return
+        try:
+            with open(self.health_file, 'r') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError) as err:
+            log.warning(f"Ignoring unreadable proxy health file {self.health_file}: {err}")
+            return
+        with self._lock:
+            for proxy, stats in saved.items():
+                # Proxies removed from the input file are dropped, new ones start fresh.
+                if proxy in self._stats:
+                    self._stats[proxy].update({k: v for k, v in stats.items() if k in self._stats[proxy]})
+        log.info(f"Loaded proxy health for {len(saved)} proxies from {self.health_file}")
+
+    def save(self):
+        if not self.health_file:
+            return
+        with self._lock:
+            snapshot = {proxy: dict(stats) for proxy, stats in self._stats.items()}
+        tmp_file = self.health_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f, indent=4)
+        os.replace(tmp_file, self.health_file)
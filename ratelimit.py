@@ -0,0 +1,119 @@
+import email.utils
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from metrics import METRICS
+log = logging.getLogger("retrieve_github")
+
+THROTTLE_MARKERS = ("secondary rate limit", "abuse detection", "rate limit exceeded")
+
+
+def throttle_delay(response, default_delay=30.0):
+    # Returns how long to back off when the response is GitHub throttling us, None otherwise.
+    status = response.status_code
+    if status == 429:
+        throttled = True
+    elif status in (403, 503):
+        text = response.text.lower() if isinstance(response.text, str) else ""
+        throttled = any(marker in text for marker in THROTTLE_MARKERS) or "Retry-After" in response.headers
+    else:
+        throttled = False
+    if not throttled:
+        return None
+    return parse_retry_after(response.headers.get("Retry-After"), default_delay)
+
+
+def parse_retry_after(value, default_delay=30.0):
+    if not value:
+        return default_delay
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default_delay
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class HostLimiter:
+    # Token bucket capping the request rate to one host, combined with an AIMD window on the number
+    # of requests in flight: +1 per window of successes, halved on every throttled response. A
+    # Retry-After pauses the whole host. Hedged copies take a token but stay outside the window: they
+    # race a request that already holds a slot, and waiting for a slot would mean waiting for the
+    # very request they are meant to overtake.
+    def __init__(self, host, rate=None, burst=1, initial_concurrency=4, min_concurrency=1, max_concurrency=None,
+                 decrease=0.5):
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be > 0, got {rate}")
+        self.host = host
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency or initial_concurrency
+        self.decrease = decrease
+        self.limit = float(initial_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, hedge=False):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.paused_until > now:
+                    wait = self.paused_until - now
+                elif not hedge and self.in_flight >= int(self.limit):
+                    wait = None
+                elif self.rate is not None and self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    if self.rate is not None:
+                        self._tokens -= 1
+                    if not hedge:
+                        self.in_flight += 1
+                    return
+                self._cond.wait(wait)
+
+    def release(self, throttled=False, retry_after=None, hedge=False):
+        with self._cond:
+            if not hedge:
+                self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit * self.decrease)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                log.warning(f"Throttled by {self.host}: concurrency limit {int(self.limit)}, "
+                            f"pausing {retry_after or 0:.0f}s")
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            METRICS.observe("host_concurrency_limit", self.limit, host=self.host)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    def __init__(self, rate=None, burst=1, initial_concurrency=4, max_concurrency=None, max_throttle_retries=3):
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_throttle_retries = max_throttle_retries
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def for_host(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(host, self.rate, self.burst, self.initial_concurrency,
+                                                max_concurrency=self.max_concurrency)
+            return self._hosts[host]
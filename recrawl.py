@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+from utils import read_jsonl
+from columnar import COLUMNAR_EXTENSIONS, read_columnar
+log = logging.getLogger("retrieve_github")
+
+
+class RecrawlIndex:
+    # Records of the previous snapshot keyed by URL. A repo whose "updated" marker from the search
+    # listing is the same as in the previous snapshot has not been pushed to since, so its record is
+    # reused instead of fetching and parsing the repo page again.
+    def __init__(self, records=()):
+        self.previous = {}
+        for record in records:
+            if record.get("url"):
+                # In an appended jsonl history the most recent record of a URL wins.
+                self.previous[record["url"]] = record
+        self.current = {}
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        if not os.path.exists(path):
+            log.info(f"No previous snapshot at {path}, every record is new")
+            return cls()
+        if path.endswith(".jsonl"):
+            return cls(read_jsonl(path))
+        if path.endswith(COLUMNAR_EXTENSIONS):
+            return cls(read_columnar(path).records())
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def lookup(self, url, updated):
+        record = self.previous.get(url)
+        if record is None or updated is None or record.get("updated") != updated or "error" in record:
+            return None
+        with self._lock:
+            self.reused += 1
+        return record
+
+    def track(self, records):
+        # Passes the records of the new run through, remembering them for delta().
+        for record in records:
+            self.current[record.get("url")] = record
+            yield record
+
+    def delta(self):
+        added, changed = [], []
+        for url, record in self.current.items():
+            previous = self.previous.get(url)
+            if previous is None:
+                added.append(record)
+            elif record != previous and "error" not in record:
+                changed.append(record)
+        removed = [url for url in self.previous if url not in self.current]
+        return {"added": added, "changed": changed, "removed": removed}
+
+
+def delta_output_file(snapshot_file):
+    base_name, _ = os.path.splitext(snapshot_file)
+    return base_name + "_delta.json"
+
+
+def save_delta(delta, snapshot_file):
+    output_file = delta_output_file(snapshot_file)
+    with open(output_file, 'w') as f:
+        json.dump(delta, f, indent=4)
+    log.info(f"Delta against the previous snapshot: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+             f"{len(delta['removed'])} removed ({output_file})")
+    return output_file
@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from metrics import METRICS
+log = logging.getLogger("retrieve_github")
+
+SEARCH_TYPES = ("repositories", "issues", "wikis")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobLimiter:
+    # Runs at most max_running jobs at a time. Up to max_queued more wait for a free slot, and
+    # jobs beyond that are refused so a burst cannot pile up unbounded work.
+    def __init__(self, max_running=2, max_queued=8):
+        if max_running < 1 or max_queued < 0:
+            raise ValueError(f"Invalid job limits: max_running={max_running}, max_queued={max_queued}")
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.running = 0
+        self.queued = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            if self.running + self.queued >= self.max_running + self.max_queued:
+                raise QueueFull(f"{self.running} jobs running and {self.queued} queued")
+            self.queued += 1
+            while self.running >= self.max_running:
+                self._cond.wait()
+            self.queued -= 1
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.running -= 1
+                self._cond.notify()
+
+    def summary(self):
+        with self._cond:
+            return {"running": self.running, "queued": self.queued}
+
+
+def parse_job(body):
+    # {"keywords": ["python", "django"], "type": "Repositories", "max_pages": 2, "max_results": 50}
+    job = json.loads(body or b"{}")
+    keywords = job.get("keywords")
+    if isinstance(keywords, str):
+        keywords = keywords.split()
+    if not keywords or not all(isinstance(keyword, str) for keyword in keywords):
+        raise ValueError("keywords must be a non-empty list of strings")
+    type_ = str(job.get("type", "Repositories"))
+    if type_.lower() not in SEARCH_TYPES:
+        raise ValueError(f"Invalid type: {type_}. Supported types are 'Repositories', 'Issues', and 'Wikis'.")
+    options = {}
+    for option in ("max_pages", "max_results"):
+        if job.get(option) is not None:
+            if not isinstance(job[option], int) or job[option] < 1:
+                raise ValueError(f"{option} must be a positive integer")
+            options[option] = job[option]
+    return keywords, type_, options
+
+
+class CrawlHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        log.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            summary = dict(self.server.jobs.summary(), status="ok")
+            summary["proxies"] = len(self.server.crawler.pool)
+            return self.send_body(200, json.dumps(summary).encode(), "application/json")
+        if path == "/metrics":
+            return self.send_body(200, METRICS.to_prometheus().encode(), "text/plain; version=0.0.4")
+        self.send_body(404, b'{"error": "not found"}', "application/json")
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/search":
+            return self.send_body(404, b'{"error": "not found"}', "application/json")
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            keywords, type_, options = parse_job(body)
+        except ValueError as err:
+            # json.JSONDecodeError is a ValueError too.
+            return self.send_body(400, json.dumps({"error": str(err)}).encode(), "application/json")
+        try:
+            with self.server.jobs.slot():
+                finished = self.stream_search(keywords, type_, options)
+        except QueueFull as err:
+            METRICS.inc("server_jobs_total", outcome="refused")
+            return self.send_body(503, json.dumps({"error": f"Too many jobs: {err}"}).encode(), "application/json",
+                                  {"Retry-After": "1"})
+        if finished:
+            # The last chunk is only sent once the slot is free, so a client that has read the whole
+            # stream never sees its job still running in /health.
+            self.write_chunk(b"")
+
+    def stream_search(self, keywords, type_, options):
+        # Records are sent as NDJSON, one chunk per record, as soon as the crawl yields them. Returns
+        # False when the client went away, otherwise the caller ends the stream.
+        log.info(f"Job {'+'.join(keywords)} ({type_}) started")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        records = self.server.crawler.iter_search(keywords, type_, **options)
+        count = 0
+        try:
+            for record in records:
+                self.write_chunk(json.dumps(record).encode() + b"\n")
+                count += 1
+            outcome = "done"
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away: stop crawling for it.
+            log.warning(f"Client of job {'+'.join(keywords)} disconnected after {count} records")
+            METRICS.inc("server_jobs_total", outcome="disconnected")
+            return False
+        except Exception as err:
+            log.error(f"Job {'+'.join(keywords)} failed: {err}")
+            self.write_chunk(json.dumps({"error": str(err)}).encode() + b"\n")
+            outcome = "failed"
+        finally:
+            records.close()
+        METRICS.inc("server_jobs_total", outcome=outcome)
+        log.info(f"Job {'+'.join(keywords)} ({type_}) {outcome}: {count} records")
+        return True
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CrawlServer(ThreadingHTTPServer):
+    # Keeps one Crawler (proxy pool, connections, response cache) warm across all the jobs it serves.
+    daemon_threads = True
+
+    def __init__(self, crawler, address=("127.0.0.1", 8000), max_running=2, max_queued=8):
+        super().__init__(address, CrawlHandler)
+        self.crawler = crawler
+        self.jobs = JobLimiter(max_running, max_queued)
+
+
+def serve(crawler, host="127.0.0.1", port=8000, max_running=2, max_queued=8):
+    server = CrawlServer(crawler, (host, port), max_running, max_queued)
+    log.info(f"Serving search jobs on http://{host}:{server.server_address[1]}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down")
+    finally:
+        server.server_close()
@@ -0,0 +1,35 @@
+import pytest
+from bench_crawl import compare, percentile, run_benchmark, start_servers
+from metrics import METRICS
+
+
+@pytest.fixture
+def fake_github():
+    config = {"type": "repositories", "pages": 2, "results_per_page": 3, "repo_page_kb": 10, "search_page_kb": 10,
+              "latency": 0.0, "error_rate": 0.0, "proxies": 2, "proxy_latency": 0.0, "dead_proxies": 1,
+              "dying_proxies": 1, "proxy_die_after": 2, "workers": 2, "max_per_proxy": None, "timeout": 5}
+    servers, base_url, proxies = start_servers(config)
+    yield config, base_url, proxies
+    for server in servers:
+        server.shutdown()
+
+
+def test_benchmark_crawls_fake_github_through_proxies(fake_github):
+    config, base_url, proxies = fake_github
+    METRICS.reset()
+    result = run_benchmark(config, base_url, proxies)
+
+    assert result["results"] == 6
+    assert result["failed"] == 0
+    assert result["requests"] >= 8  # 2 search pages + 6 repo pages, plus retries on dead proxies
+    assert result["parse_ms_per_page"] > 0
+    histograms = {histogram["name"] for histogram in METRICS.summary()["histograms"]}
+    assert {"request_connect_seconds", "request_ttfb_seconds", "request_body_seconds", "parse_seconds"} <= histograms
+
+
+def test_compare_flags_regressions():
+    baseline = {"throughput_rps": 10, "latency_p95_ms": 100, "parse_ms_per_page": 5, "peak_rss_mb": 100}
+    assert compare(dict(baseline), baseline, 0.2) == []
+    regressions = compare(dict(baseline, throughput_rps=7, peak_rss_mb=150), baseline, 0.2)
+    assert len(regressions) == 2
+    assert percentile([3, 1, 2, 4], 0.5) in (2, 3)
@@ -0,0 +1,70 @@
+import os
+import pytest
+from requests import Response
+from cache import ResponseCache
+from transport import Transport
+from utils import get_proxy_and_response
+
+
+def make_response(content, status_code=200, headers=None):
+    response = Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = ResponseCache(str(tmpdir.join('cache.sqlite')), ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_cache_round_trip(cache):
+    cache.store('https://github.com/a/b', None, make_response(b'<html>repo</html>', headers={'ETag': '"abc"'}))
+
+    entry = cache.lookup('https://github.com/a/b')
+    assert cache.is_fresh(entry)
+    assert cache.to_response(entry).content == b'<html>repo</html>'
+    assert cache.conditional_headers(entry) == {'If-None-Match': '"abc"'}
+    assert cache.lookup('https://github.com/a/b', {'p': 2}) is None
+
+
+def test_fresh_cache_hit_skips_network(cache, mocker):
+    cache.store('https://github.com/a/b', None, make_response(b'cached'))
+    transport = Transport(cache=cache)
+    get_mock = mocker.patch.object(transport, 'get')
+
+    response = get_proxy_and_response(['http://1.2.3.4:80'], 'https://github.com/a/b', {}, transport=transport)
+
+    assert response.content == b'cached'
+    get_mock.assert_not_called()
+    assert cache.summary() == {'hits': 1, 'misses': 0, 'revalidated': 0}
+
+
+def test_stale_entry_is_revalidated(cache, mocker):
+    cache.store('https://github.com/a/b', None, make_response(b'cached', headers={'ETag': '"v1"'}))
+    cache.ttl = 0
+    transport = Transport(cache=cache)
+    get_mock = mocker.patch.object(transport, 'get', return_value=make_response(b'', status_code=304))
+
+    response = get_proxy_and_response(['http://1.2.3.4:80'], 'https://github.com/a/b', {}, transport=transport)
+
+    assert response.content == b'cached'
+    assert get_mock.call_args.args[2] == {'If-None-Match': '"v1"'}
+    assert cache.summary() == {'hits': 0, 'misses': 1, 'revalidated': 1}
+
+
+def test_cache_evicts_least_recently_used(tmpdir):
+    cache = ResponseCache(str(tmpdir.join('cache.sqlite')), max_bytes=2500)
+    body = os.urandom(1000)  # incompressible
+    cache.store('https://github.com/1', None, make_response(body))
+    cache.store('https://github.com/2', None, make_response(body))
+    cache.lookup('https://github.com/1')
+    cache.store('https://github.com/3', None, make_response(body))
+
+    assert cache.lookup('https://github.com/1') is not None
+    assert cache.lookup('https://github.com/2') is None
+    assert cache.lookup('https://github.com/3') is not None
+    cache.close()
@@ -0,0 +1,64 @@
+import json
+import pytest
+from columnar import LanguageColumns, convert, read_columnar, save_columnar, write_columnar
+from recrawl import RecrawlIndex
+
+RECORDS = [
+    {"url": "https://github.com/a/one", "extra": {"owner": "a", "language_stats": {"Python": 80.5, "C": 19.5}},
+     "updated": "2023-04-01T10:00:00Z"},
+    {"url": "https://github.com/b/two", "extra": {"owner": "b", "language_stats": {"C": 100.0}}},
+    {"url": "https://github.com/c/three", "extra": {"owner": "c", "language_stats": {}}, "error": "timed out"},
+    {"url": "https://github.com/d/four/issues/1"},
+]
+
+
+def test_language_columns_intern_languages():
+    columns = LanguageColumns.from_records(RECORDS)
+    assert columns.languages == ["Python", "C"]
+    assert list(columns.offsets) == [0, 2, 3, 3, 3]
+    assert list(columns.lang_ids) == [0, 1, 1]
+    assert list(columns.records()) == RECORDS
+
+
+@pytest.mark.parametrize("extension", [".npz", ".parquet"])
+def test_columnar_file_round_trip(tmp_path, extension):
+    pytest.importorskip("numpy")
+    if extension == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"output_repositories{extension}")
+    write_columnar(RECORDS, path)
+    columns = read_columnar(path)
+    assert list(columns.records()) == RECORDS
+    assert columns.language_totals() == {"Python": 80.5, "C": 119.5}
+
+
+def test_write_columnar_rejects_unknown_extension(tmp_path):
+    with pytest.raises(ValueError):
+        write_columnar(RECORDS, str(tmp_path / "output.csv"))
+
+
+def test_save_columnar_appends(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr("columnar.columnar_extension", lambda: ".npz")
+    output_file = str(tmp_path / "output.json")
+    assert save_columnar(RECORDS[:2], output_file, "Repositories") == str(tmp_path / "output_repositories.npz")
+    save_columnar(RECORDS[2:], output_file, "Repositories", append_output=True)
+    assert list(read_columnar(str(tmp_path / "output_repositories.npz")).records()) == RECORDS
+
+
+def test_convert_round_trip(tmp_path):
+    pytest.importorskip("numpy")
+    json_file = tmp_path / "output_repositories.json"
+    json_file.write_text(json.dumps(RECORDS))
+    convert(str(json_file), str(tmp_path / "output_repositories.npz"))
+    convert(str(tmp_path / "output_repositories.npz"), str(tmp_path / "back.jsonl"))
+    with open(tmp_path / "back.jsonl") as f:
+        assert [json.loads(line) for line in f] == RECORDS
+
+
+def test_recrawl_index_reads_columnar_snapshot(tmp_path):
+    pytest.importorskip("numpy")
+    path = str(tmp_path / "output_repositories.npz")
+    write_columnar(RECORDS, path)
+    recrawl = RecrawlIndex.from_file(path)
+    assert recrawl.lookup("https://github.com/a/one", "2023-04-01T10:00:00Z") == RECORDS[0]
@@ -0,0 +1,43 @@
+import pytest
+from crawler import CrawlConfig, Crawler, NetworkConfig
+from fixtures import LANGUAGES_HTML, make_response, make_search_page
+
+
+def test_crawler_searches_with_config_objects(tmpdir, mocker):
+    repo_page = make_response(LANGUAGES_HTML)
+    get_response_mock = mocker.patch('main.get_response', return_value=make_search_page(['/a/one', '/b/two'], False))
+    mocker.patch('main.get_proxy_and_response', return_value=repo_page)
+    health_file = str(tmpdir.join('health.json'))
+
+    with Crawler(['http://1.2.3.4:80'], CrawlConfig(workers=2, max_results=1),
+                 NetworkConfig(proxy_health_file=health_file, max_hedges=1)) as crawler:
+        records = crawler.search(['python', 'django'], 'Repositories')
+        assert crawler.transport.hedger is crawler.hedger
+        assert set(crawler.summary()) == {'proxies', 'hedging'}
+
+    assert records == [{'url': 'https://github.com/a/one',
+                        'extra': {'owner': 'a', 'language_stats': {'Python': 60.0, 'JavaScript': 40.0}}}]
+    assert get_response_mock.call_args[0][1] == 'python+django'
+    assert tmpdir.join('health.json').check()
+
+
+def test_crawlers_keep_their_own_parser(mocker):
+    mocker.patch('main.get_response', return_value=make_search_page(['/a/one'], False))
+    mocker.patch('main.get_proxy_and_response', return_value=make_response(LANGUAGES_HTML))
+
+    first = Crawler(['http://1.2.3.4:80'], CrawlConfig(parse_processes=1, workers=2))
+    second = Crawler(['http://1.2.3.4:80'], CrawlConfig(parser='html.parser'))
+    first.close()
+    # Closing the first crawler leaves the parser of the second one alone.
+    assert second.search(['python'], 'Repositories')[0]['extra']['language_stats'] == {'Python': 60.0,
+                                                                                       'JavaScript': 40.0}
+    assert second.parser.backend == 'html.parser'
+    second.close()
+
+
+def test_parse_processes_need_several_workers():
+    with pytest.raises(ValueError):
+        Crawler(['http://1.2.3.4:80'], CrawlConfig(parse_processes=2))
+    with Crawler(['http://1.2.3.4:80'], CrawlConfig(parse_processes=1, workers=8)) as crawler:
+        # The pool bounds the pages handed over, not the number of fetchers.
+        assert crawler.parser.max_pending == 2
@@ -0,0 +1,84 @@
+import json
+import time
+from argparse import Namespace
+import pytest
+from frontier import Frontier
+from main import run_frontier_worker, seed_frontier
+from fixtures import LANGUAGES_HTML, make_response, make_search_page
+
+
+@pytest.fixture
+def frontier(tmpdir):
+    frontier = Frontier(str(tmpdir.join('frontier.sqlite')), lease_seconds=60, max_attempts=2)
+    yield frontier
+    frontier.close()
+
+
+def test_frontier_dedups_and_leases_once(frontier):
+    assert frontier.add("repo", "repo:a", {"url": "a"})
+    assert not frontier.add("repo", "repo:a", {"url": "a"})
+
+    task = frontier.lease("w1")
+    assert (task.key, task.payload, task.attempts) == ("repo:a", {"url": "a"}, 1)
+    assert frontier.lease("w2") is None
+    assert not frontier.drained()
+
+    assert frontier.complete(task, {"url": "a"})
+    assert not frontier.complete(task, {"url": "late"})
+    assert frontier.result("repo:a") == {"url": "a"}
+    assert frontier.drained()
+
+
+def test_frontier_expired_lease_is_taken_over(tmpdir):
+    frontier = Frontier(str(tmpdir.join('frontier.sqlite')), lease_seconds=0.05, max_attempts=2)
+    frontier.add("repo", "repo:a", {"url": "a"})
+    frontier.lease("dead-worker")
+    time.sleep(0.1)
+
+    task = frontier.lease("w2")
+    assert task.attempts == 2
+    time.sleep(0.1)
+    assert frontier.lease("w3") is None  # given up after max_attempts
+    assert frontier.counts() == {"failed": 1}
+    frontier.close()
+
+
+def test_frontier_failed_task_is_retried(frontier):
+    frontier.add("repo", "repo:a", {"url": "a"})
+    frontier.fail(frontier.lease("w1"), "boom")
+    task = frontier.lease("w1")
+    frontier.fail(task, "boom", {"url": "a", "error": "boom"})
+    assert frontier.counts() == {"failed": 1}
+    assert frontier.result("repo:a") == {"url": "a", "error": "boom"}
+
+
+def test_export_waits_for_the_rest_of_the_work(frontier):
+    frontier.add("export", "export:job1", {}, "job1")
+    frontier.add("search", "search:job1:1", {}, "job1")
+    task = frontier.lease("w1")
+    assert task.kind == "search"
+    assert frontier.lease("w2") is None
+    frontier.complete(task, {"records": []})
+    assert frontier.lease("w2").kind == "export"
+
+
+def test_frontier_workers_share_a_crawl(frontier, tmpdir, mocker):
+    repo_page = make_response(LANGUAGES_HTML)
+    pages = {1: make_search_page(['/a/one', '/b/two'], True), 2: make_search_page(['/b/two', '/c/three'], False)}
+    mocker.patch('main.get_response', side_effect=lambda *args: pages[args[-1]])
+    get_mock = mocker.patch('main.get_proxy_and_response', return_value=repo_page)
+    args = Namespace(max_pages=5, max_results=None, output_file=str(tmpdir.join('output.json')),
+                     output_format='json', append_output=False)
+    jobs = [{'id': None, 'keywords': ['python'], 'type': 'Repositories', 'output_file': args.output_file}]
+
+    seed_frontier(frontier, jobs, args)
+    seed_frontier(frontier, jobs, args)  # a second worker process seeding the same input
+    done = run_frontier_worker(frontier, 'host-1', ['http://1.2.3.4:80'], mocker.Mock(), workers=3,
+                               poll_interval=0.01)
+
+    assert done == 6  # 2 search pages, 3 distinct repos, 1 export
+    assert get_mock.call_count == 3
+    with open(tmpdir.join('output_repositories.json')) as f:
+        records = json.load(f)
+    assert [record['url'] for record in records] == ['https://github.com/a/one', 'https://github.com/b/two',
+                                                     'https://github.com/b/two', 'https://github.com/c/three']
@@ -0,0 +1,123 @@
+import time
+import pytest
+from crawler import Crawler, NetworkConfig
+from fixtures import make_response
+from hedge import Hedger
+from metrics import METRICS
+from proxy_pool import ProxyPool
+from transport import Transport
+from utils import ProxyLimiter, _hedged_fetch, get_proxy_and_response
+
+
+@pytest.fixture
+def slow_first(mocker):
+    # The first proxy tried answers after 0.5s, the second one right away.
+    def fake_get(proxy, url, headers, **kwargs):
+        if proxy == 'http://slow:80':
+            time.sleep(0.5)
+        return make_response(proxy.encode())
+
+    pool = ProxyPool(['http://slow:80', 'http://fast:80'])
+    mocker.patch.object(pool, 'candidates', return_value=['http://slow:80', 'http://fast:80'])
+    METRICS.reset()
+    return pool, fake_get
+
+
+def test_hedger_delay_follows_observed_latencies():
+    hedger = Hedger(min_samples=10, default_delay=1.5)
+    assert hedger.delay() == 1.5
+    for i in range(100):
+        hedger.observe(0.02 if i < 90 else 3.0)
+    assert 0.01 < hedger.delay() < 0.05
+    assert Hedger(delay=0.2).delay() == 0.2
+
+
+def test_hedger_caps_extra_load():
+    hedger = Hedger(max_extra_load=0.1)
+    for _ in range(20):
+        hedger.start_request()
+    assert [hedger.allow_hedge() for _ in range(3)] == [True, True, False]
+    assert hedger.summary() == {"requests": 20, "hedges": 2}
+
+
+def test_slow_request_is_hedged_on_another_proxy(slow_first, mocker):
+    pool, fake_get = slow_first
+    transport = Transport(hedger=Hedger(delay=0.05, max_extra_load=1.0))
+    mocker.patch.object(transport, 'get', side_effect=fake_get)
+
+    start = time.monotonic()
+    response = get_proxy_and_response(pool, 'https://github.com/a/b', {}, transport=transport)
+    assert time.monotonic() - start < 0.4
+    assert response.content == b'http://fast:80'
+    assert METRICS.counter("hedged_requests_total") == 1
+    assert METRICS.counter("hedged_wins_total") == 1
+
+
+def test_no_hedge_without_budget(slow_first, mocker):
+    pool, fake_get = slow_first
+    transport = Transport(hedger=Hedger(delay=0.05, max_extra_load=0.0))
+    mocker.patch.object(transport, 'get', side_effect=fake_get)
+
+    response = get_proxy_and_response(pool, 'https://github.com/a/b', {}, transport=transport)
+    assert response.content == b'http://slow:80'
+    assert METRICS.counter("hedged_requests_total") == 0
+
+
+def test_crawler_hedges_with_a_single_worker(slow_first, mocker):
+    # The host concurrency window is one request wide: the hedge must not wait for the slow request.
+    pool, fake_get = slow_first
+    crawler = Crawler(pool, network=NetworkConfig(max_hedges=1, hedge_delay=0.05, hedge_budget=1.0))
+    mocker.patch.object(crawler.transport, 'get', side_effect=fake_get)
+
+    start = time.monotonic()
+    response = get_proxy_and_response(pool, 'https://github.com/a/b', {}, transport=crawler.transport)
+    assert time.monotonic() - start < 0.4
+    assert response.content == b'http://fast:80'
+    crawler.close()
+    time.sleep(0.5)
+    # The losing request released its slot of the window, the hedge never took one.
+    assert crawler.rate_limiter.for_host('github.com').in_flight == 0
+
+
+def test_no_hedge_onto_a_busy_proxy(slow_first, mocker):
+    pool, fake_get = slow_first
+    hedger = Hedger(delay=0.05, max_extra_load=1.0)
+    transport = Transport(hedger=hedger)
+    mocker.patch.object(transport, 'get', side_effect=fake_get)
+    limiter = ProxyLimiter(1)
+    limiter.acquire('http://fast:80')
+
+    response = get_proxy_and_response(pool, 'https://github.com/a/b', {}, limiter=limiter, transport=transport)
+    assert response.content == b'http://slow:80'
+    assert hedger.summary() == {"requests": 1, "hedges": 0}
+
+
+def test_responses_finishing_together_are_closed_but_one(mocker):
+    hedger = Hedger(max_hedges=2, max_extra_load=1.0)
+    responses = []
+
+    def attempt(proxy, hedge=False):
+        time.sleep(0.1)
+        response = mocker.Mock()
+        responses.append(response)
+        return response
+
+    def delay():
+        # Hedge right away, then hold the caller until both requests are done so that wait()
+        # returns them together.
+        if hedger.hedges == 0:
+            return 0.0
+        while len(responses) < 2:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        return 1.0
+
+    def next_hedge_proxy():
+        return 'http://hedge:80' if hedger.allow_hedge() else None
+
+    mocker.patch.object(hedger, 'delay', side_effect=delay)
+    response = _hedged_fetch(['http://hedge:80'], lambda: 'http://primary:80', next_hedge_proxy, attempt, hedger)
+    hedger.close()
+    assert len(responses) == 2 and response in responses
+    assert [r.close.called for r in responses if r is not response] == [True]
+    assert not response.close.called
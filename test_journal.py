@@ -0,0 +1,57 @@
+import pytest
+from journal import CrawlJournal
+from main import iter_search, search
+from fixtures import LANGUAGES_HTML, make_response, make_search_page
+
+
+@pytest.fixture
+def journal_path(tmpdir):
+    return str(tmpdir.join('journal.sqlite'))
+
+
+@pytest.fixture
+def repo_response():
+    return make_response(LANGUAGES_HTML)
+
+
+def test_journal_round_trip(journal_path):
+    journal = CrawlJournal(journal_path)
+    journal.record_page('repositories:python:https://github.com', 1, [['a'], ['https://github.com/a/one']], True)
+    journal.record_repo('https://github.com/a/one', {'url': 'https://github.com/a/one'})
+    journal.close()
+
+    resumed = CrawlJournal(journal_path, resume=True)
+    assert resumed.get_page('repositories:python:https://github.com', 1) == ([['a'], ['https://github.com/a/one']],
+                                                                            True)
+    assert resumed.get_page('repositories:python:https://github.com', 2) is None
+    assert resumed.get_repo('https://github.com/a/one') == {'url': 'https://github.com/a/one'}
+    assert (resumed.pages_reused, resumed.repos_reused) == (1, 1)
+    resumed.close()
+
+    fresh = CrawlJournal(journal_path)
+    assert fresh.counts() == (0, 0)
+    fresh.close()
+
+
+def test_resume_skips_completed_work(journal_path, repo_response, mocker):
+    page = make_search_page(['/a/one', '/b/two', '/c/three'], False)
+    mocker.patch('main.get_response', return_value=page)
+    mocker.patch('main.get_proxy_and_response', return_value=repo_response)
+
+    journal = CrawlJournal(journal_path)
+    records = iter_search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(), journal=journal)
+    first = next(records)
+    records.close()  # the crawl dies after the first repo
+    journal.close()
+
+    get_response_mock = mocker.patch('main.get_response')
+    get_mock = mocker.patch('main.get_proxy_and_response', return_value=repo_response)
+    journal = CrawlJournal(journal_path, resume=True)
+    records = search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(), journal=journal)
+    journal.close()
+
+    assert records[0] == first
+    assert [record['url'] for record in records] == ['https://github.com/a/one', 'https://github.com/b/two',
+                                                     'https://github.com/c/three']
+    get_response_mock.assert_not_called()
+    assert get_mock.call_count == 2
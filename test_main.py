@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 from requests import Response
 
 from main import *
+from fixtures import make_search_page
 
 
 @pytest.fixture
@@ -135,3 +136,80 @@ def test_search_repo_no_results():
     assert str(excinfo.value) == "Your search did not match any repositories."
 
 
+def test_get_extra_concurrent_keeps_order_and_reports_failures(mock_response, mocker):
+    repos = [f"https://github.com/owner{i}/repo{i}" for i in range(6)]
+    owners = [f"owner{i}" for i in range(6)]
+
+    def fake_get(proxies, url, headers, params=None, limiter=None, transport=None, stream=False):
+        if url.endswith("repo3"):
+            raise RuntimeError("ERROR: All proxies failed")
+        return mock_response
+
+    mocker.patch('main.get_proxy_and_response', side_effect=fake_get)
+    repo_info = get_extra(repos, owners, ['http://1.2.3.4:80'], {}, workers=4, max_per_proxy=2)
+
+    assert [repo['url'] for repo in repo_info] == repos
+    assert repo_info[0]['extra'] == {'owner': 'owner0', 'language_stats': {'Python': 60.0, 'JavaScript': 40.0}}
+    assert repo_info[3]['error'] == "ERROR: All proxies failed"
+    assert repo_info[3]['extra']['language_stats'] == {}
+    assert all('error' not in repo for i, repo in enumerate(repo_info) if i != 3)
+
+
+def test_get_extra_invalid_workers():
+    with pytest.raises(ValueError):
+        get_extra([], [], [], {}, workers=0)
+
+
+def test_iter_search_walks_pagination(mock_response, mocker):
+    pages = {1: make_search_page(['/a/one', '/b/two'], True),
+             2: make_search_page(['/c/three'], False)}
+    get_response_mock = mocker.patch('main.get_response',
+                                      side_effect=lambda *args: pages[args[-1]])
+    mocker.patch('main.get_proxy_and_response', return_value=mock_response)
+
+    records = iter_search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(), max_pages=5)
+    get_response_mock.assert_not_called()  # nothing is fetched until the generator is consumed
+    assert next(records)['url'] == 'https://github.com/a/one'
+    assert [record['url'] for record in records] == ['https://github.com/b/two', 'https://github.com/c/three']
+    assert get_response_mock.call_count == 2
+
+
+def test_search_max_results(mock_response, mocker):
+    page = make_search_page(['/a/one', '/b/two', '/c/three'], True)
+    get_response_mock = mocker.patch('main.get_response', return_value=page)
+    mocker.patch('main.get_proxy_and_response', return_value=mock_response)
+
+    records = search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(), max_pages=5,
+                     max_results=4)
+    assert [record['url'] for record in records] == ['https://github.com/a/one', 'https://github.com/b/two',
+                                                     'https://github.com/c/three', 'https://github.com/a/one']
+    assert get_response_mock.call_count == 2
+
+
+def test_repo_memo_enriches_shared_urls_once(mock_response, mocker):
+    memo = RepoMemo()
+    get_mock = mocker.patch('main.get_proxy_and_response', return_value=mock_response)
+    first = make_search_page(['/a/one', '/b/two'], False)
+    second = make_search_page(['/b/two', '/c/three'], False)
+    mocker.patch('main.get_response', side_effect=[first, second])
+
+    first_records = search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(), memo=memo)
+    second_records = search('django', ['http://1.2.3.4:80'], 'repositories', workers=2, transport=mocker.Mock(),
+                            memo=memo)
+
+    assert [record['url'] for record in second_records] == ['https://github.com/b/two', 'https://github.com/c/three']
+    assert second_records[0] == first_records[1]
+    assert get_mock.call_count == 3
+    assert memo.hits == 1
+
+
+def test_repo_memo_retries_failures():
+    memo = RepoMemo()
+    memo.get_or_enrich('https://github.com/a/one', lambda: {'url': 'https://github.com/a/one', 'error': 'boom'})
+    record = memo.get_or_enrich('https://github.com/a/one', lambda: {'url': 'https://github.com/a/one'})
+    assert record == {'url': 'https://github.com/a/one'}
+    assert memo.hits == 0
+
+
+def test_job_output_file():
+    assert job_output_file('out/output.json', 'job2') == 'out/output_job2.json'
@@ -0,0 +1,51 @@
+import json
+import requests
+from metrics import Histogram, Metrics
+from transport import Transport
+from utils import get_proxy_and_response
+
+
+def test_metrics_counters_and_histograms(tmpdir):
+    metrics = Metrics()
+    metrics.inc("requests_total", proxy="p1", outcome="success")
+    metrics.inc("requests_total", proxy="p1", outcome="success")
+    metrics.inc("requests_total", proxy="p2", outcome="timeout")
+    for value in (0.02, 0.03, 0.2, 2.0):
+        metrics.observe("request_seconds", value, proxy="p1")
+    with metrics.timer("parse_seconds", page="repo"):
+        pass
+
+    assert metrics.counter("requests_total", proxy="p1", outcome="success") == 2
+    assert metrics.histogram("request_seconds", proxy="p1").count == 4
+    assert metrics.histogram("parse_seconds", page="repo").count == 1
+
+    summary = json.load(open(metrics.write_json(str(tmpdir.join('metrics.json')), {"elapsed_seconds": 1})))
+    assert summary["elapsed_seconds"] == 1
+    assert {"name": "requests_total", "labels": {"outcome": "timeout", "proxy": "p2"}, "value": 1} \
+        in summary["counters"]
+
+    prometheus = metrics.to_prometheus()
+    assert '# TYPE githubcrawler_requests_total counter' in prometheus
+    assert 'githubcrawler_requests_total{outcome="success",proxy="p1"} 2' in prometheus
+    assert 'githubcrawler_request_seconds_bucket{proxy="p1",le="+Inf"} 4' in prometheus
+    assert 'githubcrawler_request_seconds_count{proxy="p1"} 4' in prometheus
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 3, 4))
+    for value in (0.5, 1.5, 2.5, 3.5):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 2
+    assert 3 <= histogram.quantile(0.95) <= 3.5
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_get_proxy_and_response_records_metrics(mocker):
+    metrics = Metrics()
+    mocker.patch('utils.METRICS', metrics)
+    transport = Transport()
+    mocker.patch.object(transport, 'get', side_effect=[requests.exceptions.Timeout, mocker.Mock()])
+    get_proxy_and_response(['p1', 'p2'], 'https://example.com', {}, transport=transport)
+
+    outcomes = {c["labels"]["outcome"] for c in metrics.summary()["counters"] if c["name"] == "requests_total"}
+    assert outcomes == {"timeout", "success"}
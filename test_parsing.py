@@ -0,0 +1,96 @@
+import pytest
+from bs4 import BeautifulSoup
+
+import parsing
+from main import enrich_repo, get_extra_info, search_repo, search_issues, search_wikis
+from fixtures import LANGUAGES_HTML, ISSUES_HTML, WIKIS_HTML, REPO_LIST_HTML, make_response
+from pipeline import InlineParser
+
+
+@pytest.fixture(params=parsing.available_backends())
+def backend(request):
+    return request.param
+
+
+def test_backends_extract_identical_languages(backend):
+    parser = InlineParser(backend)
+    page = b'<ul><li class="d-inline">nav</li></ul>' + LANGUAGES_HTML
+    assert get_extra_info(make_response(page), parser) == (['Python', 'JavaScript'], ['60%', '40%'])
+    assert get_extra_info(make_response(b'<html><h2>About</h2></html>'), parser) == (['None'], ['0%'])
+
+
+@pytest.mark.parametrize("type_, html, extract", [
+    ("repositories", REPO_LIST_HTML, search_repo),
+    ("issues", ISSUES_HTML, search_issues),
+    ("wikis", WIKIS_HTML, search_wikis),
+])
+def test_targeted_search_parsing_matches_full_parse(backend, type_, html, extract):
+    page = '<div class="header"><a href="/login">Sign in</a></div>' + html
+    full_soup = BeautifulSoup(page, 'html.parser')
+    targeted_soup = parsing.make_soup(page, parsing.search_strainer(type_), backend)
+    assert extract(targeted_soup, 'https://github.com') == extract(full_soup, 'https://github.com')
+
+
+def test_has_next_page():
+    assert parsing.has_next_page(b'<a class="next_page" rel="next" href="/search?p=2">Next</a>')
+    assert not parsing.has_next_page(b'<span class="next_page disabled">Next</span>')
+
+
+def test_invalid_parser_backend():
+    with pytest.raises(ValueError):
+        parsing.check_parser_backend("html5lib")
+
+
+class StreamedResponse:
+    def __init__(self, content, chunk_size):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), self.chunk_size):
+            yield self.content[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_streaming_extraction_stops_after_languages():
+    page = b'<html><body><main>' + LANGUAGES_HTML.replace(b'<html>', b'').replace(b'</html>', b'') + \
+           b'<div>' + b'<p>footer</p>' * 10000 + b'</div></main></body></html>'
+    response = StreamedResponse(page, chunk_size=7)
+
+    languages, percentages, bytes_read = parsing.extract_languages_streaming(response, byte_budget=len(page))
+
+    assert (languages, percentages) == get_extra_info(make_response(page))
+    assert bytes_read < len(LANGUAGES_HTML) + 100
+    assert response.closed
+
+
+def test_streaming_extraction_respects_byte_budget():
+    page = b'<html><body>' + b'<p>filler</p>' * 1000 + LANGUAGES_HTML + b'</body></html>'
+    response = StreamedResponse(page, chunk_size=1024)
+
+    with pytest.raises(parsing.TruncatedPage):
+        parsing.extract_languages_streaming(response, byte_budget=4096)
+    assert response.closed
+
+
+def test_streaming_extraction_of_a_page_without_languages():
+    response = StreamedResponse(b'<html><body>' + b'<p>filler</p>' * 100 + b'</body></html>', chunk_size=1024)
+
+    languages, percentages, _ = parsing.extract_languages_streaming(response, byte_budget=1024 * 1024)
+    assert (languages, percentages) == (['None'], ['0%'])
+
+
+def test_truncated_or_malformed_repo_page_is_an_error(mocker):
+    page = b'<html><body>' + b'<p>filler</p>' * 1000 + LANGUAGES_HTML + b'</body></html>'
+    mocker.patch('main.get_proxy_and_response', return_value=StreamedResponse(page, chunk_size=1024))
+    record = enrich_repo('https://github.com/a/b', 'a', ['http://1.2.3.4:80'], {}, stream_budget=4096)
+    assert "Byte budget" in record['error']
+    assert record['extra']['language_stats'] == {}
+
+    mocker.patch('main.get_proxy_and_response', return_value=make_response(LANGUAGES_HTML))
+    mocker.patch('main.get_extra_info', return_value=(['Python', 'C'], ['60%', None]))
+    record = enrich_repo('https://github.com/a/b', 'a', ['http://1.2.3.4:80'], {})
+    assert record['error'] == "Missing percentage for language C"
@@ -0,0 +1,46 @@
+import pytest
+from main import get_extra, parse_search_page
+from metrics import METRICS
+from pipeline import InlineParser, ParsePool
+from fixtures import LANGUAGES_HTML, REPO_LIST_HTML, make_response
+
+
+@pytest.fixture(scope="module")
+def parse_pool():
+    with ParsePool(processes=2, max_pending=2) as pool:
+        yield pool
+
+
+def test_parse_pool_parses_in_worker_processes(parse_pool):
+    METRICS.reset()
+    assert parse_pool.parse_repo(LANGUAGES_HTML) == (['Python', 'JavaScript'], ['60%', '40%'])
+    owners, urls, updated = parse_search_page(REPO_LIST_HTML, 'repositories', 'https://github.com', parse_pool)
+    assert owners == ['abhirawat7', 'michealbalogun', 'airavata-courses']
+    assert updated == [None, None, None]
+    assert METRICS.histogram("parse_seconds", page="search").count == 1
+
+
+def test_parse_errors_reach_the_fetcher(parse_pool):
+    with pytest.raises(RuntimeError):
+        parse_search_page(b'<html></html>', 'repositories', 'https://github.com', parse_pool)
+
+
+def test_concurrent_fetchers_share_the_parse_pool(parse_pool, mocker):
+    response = make_response(LANGUAGES_HTML)
+    mocker.patch('main.get_proxy_and_response', return_value=response)
+    repos = [f'https://github.com/owner{i}/repo{i}' for i in range(8)]
+
+    records = get_extra(repos, [f'owner{i}' for i in range(8)], ['http://1.2.3.4:80'], {}, workers=4,
+                        parser=parse_pool)
+    assert [record['url'] for record in records] == repos
+    assert all(record['extra']['language_stats'] == {'Python': 60.0, 'JavaScript': 40.0} for record in records)
+
+
+def test_inline_parser_uses_its_own_backend(mocker):
+    make_soup = mocker.patch('main.make_soup', side_effect=lambda content, parse_only, backend: backend)
+    mocker.patch('main.search_repo', return_value=([], []))
+    mocker.patch('main.repo_updated_markers', return_value=[])
+    InlineParser('html.parser').parse_search(REPO_LIST_HTML, 'repositories', 'https://github.com')
+    assert make_soup.call_args[0][2] == 'html.parser'
+    with pytest.raises(ValueError):
+        InlineParser('invalid')
@@ -0,0 +1,41 @@
+import pytest
+from bench_crawl import start_servers
+from metrics import METRICS
+from probe import warm_up
+from proxy_pool import ProxyPool
+from transport import Transport
+
+
+@pytest.fixture
+def fake_github():
+    config = {"type": "repositories", "pages": 1, "results_per_page": 1, "repo_page_kb": 1, "search_page_kb": 1,
+              "latency": 0.0, "error_rate": 0.0, "proxies": 2, "proxy_latency": 0.0, "dead_proxies": 2,
+              "dying_proxies": 0, "proxy_die_after": 0}
+    servers, base_url, proxies = start_servers(config)
+    yield base_url, proxies
+    for server in servers:
+        server.shutdown()
+
+
+def test_warm_up_drops_unreachable_proxies(fake_github):
+    base_url, proxies = fake_github
+    pool = ProxyPool(proxies)
+    METRICS.reset()
+    with Transport() as transport:
+        results = warm_up(pool, transport, base_url + "/robots.txt", timeout=1.0)
+
+    assert [result["reachable"] for result in results] == [True, True, False, False]
+    assert results[0]["latency"] <= results[1]["latency"]
+    assert list(pool) == [results[0]["proxy"], results[1]["proxy"]]
+    assert pool.is_quarantined(results[2]["proxy"])
+    assert METRICS.counter("proxy_probes_total", proxy=results[3]["proxy"], outcome="unreachable") == 1
+
+
+def test_warm_up_keeps_all_proxies_when_none_answers(fake_github):
+    base_url, proxies = fake_github
+    dead = proxies[2:]
+    pool = ProxyPool(dead)
+    with Transport() as transport:
+        results = warm_up(pool, transport, base_url + "/robots.txt", timeout=1.0)
+    assert not any(result["reachable"] for result in results)
+    assert list(pool) == dead
@@ -0,0 +1,47 @@
+import pytest
+from proxy_pool import ProxyPool
+
+
+def test_proxy_pool_prefers_fast_healthy_proxies():
+    pool = ProxyPool(['fast', 'slow', 'dead'])
+    for _ in range(5):
+        pool.record_success('fast', 0.1)
+        pool.record_success('slow', 4.0)
+    pool.record_failure('dead')
+
+    firsts = [pool.candidates()[0] for _ in range(200)]
+    assert firsts.count('fast') > firsts.count('slow')
+    assert all(pool.candidates()[-1] == 'dead' for _ in range(20))
+    assert pool.is_quarantined('dead')
+
+
+def test_proxy_pool_exponential_cooloff(mocker):
+    mocker.patch('proxy_pool.time.time', return_value=1000.0)
+    pool = ProxyPool(['p'], base_cooloff=10, max_cooloff=35)
+    pool.record_failure('p')
+    assert pool.stats('p')['quarantined_until'] == 1010.0
+    pool.record_failure('p')
+    assert pool.stats('p')['quarantined_until'] == 1020.0
+    pool.record_failure('p')
+    assert pool.stats('p')['quarantined_until'] == 1035.0
+    pool.record_success('p', 1.0)
+    assert pool.stats('p')['quarantined_until'] == 0.0
+    assert pool.stats('p')['consecutive_failures'] == 0
+
+
+def test_proxy_pool_persists_health(tmpdir):
+    health_file = str(tmpdir.join('health.json'))
+    pool = ProxyPool(['a', 'b'], health_file=health_file)
+    pool.record_success('a', 0.5)
+    pool.record_failure('b')
+    pool.save()
+
+    warm_pool = ProxyPool(['a', 'b', 'c'], health_file=health_file)
+    assert warm_pool.stats('a')['latency'] == 0.5
+    assert warm_pool.is_quarantined('b')
+    assert warm_pool.stats('c')['attempts'] == 0
+
+
+def test_proxy_pool_requires_proxies():
+    with pytest.raises(ValueError):
+        ProxyPool([])
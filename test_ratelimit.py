@@ -0,0 +1,86 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from requests import Response
+
+from proxy_pool import ProxyPool
+from ratelimit import HostLimiter, RateLimiter, parse_retry_after, throttle_delay
+from transport import Transport
+from utils import get_proxy_and_response
+
+
+def make_response(status_code, text='', headers=None):
+    response = Response()
+    response.status_code = status_code
+    response._content = text.encode()
+    response.headers.update(headers or {})
+    return response
+
+
+def test_throttle_delay():
+    assert throttle_delay(make_response(200)) is None
+    assert throttle_delay(make_response(404)) is None
+    assert throttle_delay(make_response(429, headers={'Retry-After': '7'})) == 7
+    assert throttle_delay(make_response(429), default_delay=12) == 12
+    assert throttle_delay(make_response(403, 'You have exceeded a secondary rate limit')) == 30
+    assert throttle_delay(make_response(403, 'Forbidden')) is None
+
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60))
+    assert 50 < parse_retry_after(retry_at) <= 60
+    assert parse_retry_after('garbage', 5) == 5
+
+
+def test_host_limiter_aimd():
+    limiter = HostLimiter('github.com', initial_concurrency=8, max_concurrency=8)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+    assert 3 < limiter.limit < 4
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 8
+
+
+def test_host_limiter_retry_after_pauses_host():
+    limiter = HostLimiter('github.com', initial_concurrency=2)
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+    limiter.release()
+
+
+def test_host_limiter_token_bucket():
+    limiter = HostLimiter('github.com', rate=20, burst=1, initial_concurrency=4)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release()
+    assert time.monotonic() - start >= 0.15
+
+    with pytest.raises(ValueError):
+        HostLimiter('github.com', rate=0)
+
+
+def test_throttled_request_is_retried_without_burning_proxy(mocker):
+    pool = ProxyPool(['http://1.2.3.4:80'])
+    transport = Transport(rate_limiter=RateLimiter(initial_concurrency=4))
+    ok = make_response(200, 'ok')
+    throttled = make_response(429, headers={'Retry-After': '0'})
+    throttled.close = mocker.Mock()
+    mocker.patch.object(transport, 'get', side_effect=[throttled, ok])
+
+    assert get_proxy_and_response(pool, 'https://github.com/search', {}, transport=transport) is ok
+    throttled.close.assert_called_once()
+    assert not pool.is_quarantined('http://1.2.3.4:80')
+    assert transport.rate_limiter.for_host('github.com').limit == 2.5  # halved, then +1/limit
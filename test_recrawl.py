@@ -0,0 +1,63 @@
+import json
+from bs4 import BeautifulSoup
+from main import repo_updated_markers, search
+from recrawl import RecrawlIndex, save_delta
+from fixtures import LANGUAGES_HTML, make_response
+
+LISTING_HTML = '''
+    <ul class="repo-list">
+        <li><a href="/a/one"></a><relative-time datetime="2023-04-01T10:00:00Z">Apr 1</relative-time></li>
+        <li><a href="/b/two"></a><relative-time datetime="2023-04-20T08:30:00Z">Apr 20</relative-time></li>
+        <li><a href="/c/three"></a></li>
+    </ul>
+    '''
+
+
+def previous_record(url, updated, languages):
+    return {"url": url, "extra": {"owner": url.split('/')[3], "language_stats": languages}, "updated": updated}
+
+
+def test_repo_updated_markers():
+    soup = BeautifulSoup(LISTING_HTML, 'html.parser')
+    assert repo_updated_markers(soup) == ['2023-04-01T10:00:00Z', '2023-04-20T08:30:00Z', None]
+
+
+def test_incremental_search_reuses_unchanged_repos(mocker):
+    listing = make_response(LISTING_HTML)
+    repo_page = make_response(LANGUAGES_HTML)
+    mocker.patch('main.get_response', return_value=listing)
+    get_mock = mocker.patch('main.get_proxy_and_response', return_value=repo_page)
+    unchanged = previous_record('https://github.com/a/one', '2023-04-01T10:00:00Z', {'C': 100.0})
+    recrawl = RecrawlIndex([
+        unchanged,
+        previous_record('https://github.com/b/two', '2023-03-01T00:00:00Z', {'C': 100.0}),
+        previous_record('https://github.com/d/gone', '2023-01-01T00:00:00Z', {}),
+    ])
+
+    records = list(recrawl.track(search('python', ['http://1.2.3.4:80'], 'repositories', transport=mocker.Mock(),
+                                        recrawl=recrawl)))
+
+    assert records[0] == unchanged
+    assert records[1]['updated'] == '2023-04-20T08:30:00Z'
+    assert records[1]['extra']['language_stats'] == {'Python': 60.0, 'JavaScript': 40.0}
+    assert get_mock.call_count == 2  # b/two was pushed to, c/three has no marker
+    assert recrawl.reused == 1
+    delta = recrawl.delta()
+    assert [record['url'] for record in delta['added']] == ['https://github.com/c/three']
+    assert [record['url'] for record in delta['changed']] == ['https://github.com/b/two']
+    assert delta['removed'] == ['https://github.com/d/gone']
+
+
+def test_recrawl_index_from_file(tmpdir):
+    snapshot = tmpdir.join('output_repositories.jsonl')
+    snapshot.write('{"url": "https://github.com/a/one", "updated": "1"}\n'
+                   '{"url": "https://github.com/a/one", "updated": "2"}\n')
+    recrawl = RecrawlIndex.from_file(str(snapshot))
+    assert recrawl.lookup('https://github.com/a/one', '1') is None
+    assert recrawl.lookup('https://github.com/a/one', '2') == {'url': 'https://github.com/a/one', 'updated': '2'}
+    assert RecrawlIndex.from_file(str(tmpdir.join('missing.json'))).previous == {}
+
+    delta_file = save_delta(recrawl.delta(), str(snapshot))
+    assert delta_file.endswith('output_repositories_delta.json')
+    with open(delta_file) as f:
+        assert json.load(f) == {'added': [], 'changed': [], 'removed': ['https://github.com/a/one']}
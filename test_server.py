@@ -0,0 +1,82 @@
+import http.client
+import json
+import threading
+import pytest
+from crawler import Crawler
+from server import CrawlServer, JobLimiter, QueueFull, parse_job
+from fixtures import LANGUAGES_HTML, make_response, make_search_page
+
+
+@pytest.fixture
+def server(mocker):
+    repo_page = make_response(LANGUAGES_HTML)
+    mocker.patch('main.get_response', return_value=make_search_page(['/a/one', '/b/two'], False))
+    mocker.patch('main.get_proxy_and_response', return_value=repo_page)
+    crawler = Crawler(['http://1.2.3.4:80'])
+    server = CrawlServer(crawler, ("127.0.0.1", 0), max_running=1, max_queued=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    crawler.close()
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def test_search_streams_ndjson(server):
+    status, body = request(server, "POST", "/search", {"keywords": ["python"], "type": "Repositories",
+                                                       "max_results": 1})
+    assert status == 200
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert records == [{'url': 'https://github.com/a/one',
+                        'extra': {'owner': 'a', 'language_stats': {'Python': 60.0, 'JavaScript': 40.0}}}]
+
+    status, body = request(server, "GET", "/health")
+    assert status == 200
+    assert json.loads(body) == {"running": 0, "queued": 0, "status": "ok", "proxies": 1}
+
+
+def test_invalid_job_is_rejected(server):
+    status, body = request(server, "POST", "/search", {"keywords": ["python"], "type": "Gists"})
+    assert status == 400
+    assert "Invalid type" in json.loads(body)["error"]
+
+
+def test_parse_job():
+    assert parse_job(b'{"keywords": "python django", "max_pages": 2}') == (['python', 'django'], 'Repositories',
+                                                                          {'max_pages': 2})
+    with pytest.raises(ValueError):
+        parse_job(b'{"keywords": []}')
+    with pytest.raises(ValueError):
+        parse_job(b'{"keywords": ["python"], "max_results": 0}')
+
+
+def test_job_limiter_queues_then_refuses():
+    jobs = JobLimiter(max_running=1, max_queued=1)
+    started, release = threading.Event(), threading.Event()
+
+    def run_job():
+        with jobs.slot():
+            started.set()
+            release.wait()
+
+    first = threading.Thread(target=run_job)
+    first.start()
+    started.wait()
+    started.clear()
+    second = threading.Thread(target=run_job)
+    second.start()
+    while jobs.summary()["queued"] == 0:
+        pass
+    with pytest.raises(QueueFull):
+        with jobs.slot():
+            pass
+    release.set()
+    first.join()
+    second.join()
+    assert jobs.summary() == {"running": 0, "queued": 0}
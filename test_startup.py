@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+# Cold import budget of the library API, checked with `python -X importtime`. Generous on purpose:
+# it catches a heavy import coming back, not a few milliseconds of noise.
+IMPORT_BUDGET_MS = 250
+HEAVY_MODULES = ("bs4", "tqdm", "colorlog", "requests", "lxml", "selectolax")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module, cwd):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd,
+                            env=dict(os.environ, PYTHONPATH=PACKAGE_DIR), capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_library_import_is_light(tmpdir):
+    times = import_times("crawler", str(tmpdir))
+    assert not [module for module in times if module.split(".")[0] in HEAVY_MODULES]
+    assert times["crawler"] < IMPORT_BUDGET_MS
+
+
+def test_import_has_no_side_effects(tmpdir):
+    tmpdir.join("log.txt").write("previous run")
+    code = "import logging, main; assert not logging.getLogger('retrieve_github').handlers"
+    subprocess.run([sys.executable, "-c", code], cwd=str(tmpdir), env=dict(os.environ, PYTHONPATH=PACKAGE_DIR),
+                   check=True)
+    assert tmpdir.join("log.txt").read() == "previous run"
@@ -0,0 +1,30 @@
+import pytest
+from transport import Transport
+from utils import get_proxy_and_response
+
+
+def test_transport_reuses_session_per_proxy():
+    with Transport(pool_connections=2, pool_maxsize=8) as transport:
+        session = transport.session_for('http://1.2.3.4:80')
+        assert transport.session_for('http://1.2.3.4:80') is session
+        assert transport.session_for('http://5.6.7.8:80') is not session
+        assert session.proxies == {'https': 'http://1.2.3.4:80', 'http': 'http://1.2.3.4:80'}
+        assert session.get_adapter('https://github.com')._pool_maxsize == 8
+
+
+def test_get_proxy_and_response_goes_through_transport(mocker):
+    transport = Transport()
+    response_mock = mocker.Mock()
+    get_mock = mocker.patch.object(transport, 'get', return_value=response_mock)
+    requests_mock = mocker.patch('requests.get')
+
+    result = get_proxy_and_response(['http://1.2.3.4:80'], 'https://example.com', {}, transport=transport)
+
+    assert result == response_mock
+    get_mock.assert_called_once_with('http://1.2.3.4:80', 'https://example.com', {})
+    requests_mock.assert_not_called()
+
+
+def test_transport_invalid_pool_size():
+    with pytest.raises(ValueError):
+        Transport(pool_maxsize=0)
@@ -1,6 +1,7 @@
 import os
 import json
 import pytest
+import requests
 from utils import *
 from unittest.mock import patch
 
@@ -159,3 +160,119 @@ def test_get_response_invalid_type():
     with pytest.raises(ValueError):
         get_response(type_, query, proxies, headers, base_url)
 
+
+
+def test_proxy_limiter_caps_in_flight():
+    limiter = ProxyLimiter(2)
+    assert limiter.try_acquire('p1')
+    assert limiter.try_acquire('p1')
+    assert not limiter.try_acquire('p1')
+    assert limiter.try_acquire('p2')
+    limiter.release('p1')
+    assert limiter.try_acquire('p1')
+
+    with pytest.raises(ValueError):
+        ProxyLimiter(0)
+
+
+def test_retrieve_data_uses_proxy_pool(mocker):
+    pool = ProxyPool(['http://1.2.3.4:80', 'http://5.6.7.8:80'])
+    pool.record_failure('http://1.2.3.4:80')
+    response_mock = mocker.Mock()
+    request_mock = mocker.patch('requests.get', return_value=response_mock)
+
+    assert get_proxy_and_response(pool, 'https://example.com', {}) == response_mock
+    # The quarantined proxy is only tried after the healthy one.
+    assert request_mock.call_args.kwargs['proxies']['https'] == 'http://5.6.7.8:80'
+    assert pool.stats('http://5.6.7.8:80')['successes'] == 1
+
+
+def test_save_json_streams_generator(input_data, output_file):
+    output_file = save_json((record for record in input_data), output_file, 'info', False)
+
+    with open(output_file, 'r') as f:
+        content = f.read()
+    assert content == json.dumps(input_data, indent=4)
+
+
+def test_save_json_keeps_previous_output_when_crawl_fails(input_data, output_file):
+    output_file_ = save_json(input_data, output_file, 'info', False)
+
+    def failing_crawl():
+        yield input_data[0]
+        raise RuntimeError("ERROR: All proxies failed")
+
+    with pytest.raises(RuntimeError):
+        save_json(failing_crawl(), output_file, 'info', False)
+    with open(output_file_, 'r') as f:
+        assert json.load(f) == input_data
+    assert not os.path.exists(output_file_ + ".tmp")
+
+
+def test_get_response_paginates(mocker):
+    request_mock = mocker.patch('utils.get_proxy_and_response')
+    get_response('Repositories', 'python+jwt', ['http://1.2.3.4:80'], {}, 'https://github.com', page=3)
+
+    request_mock.assert_called_once_with(['http://1.2.3.4:80'], 'https://github.com/search', {},
+                                         {'q': 'python jwt', 'type': 'repositories', 'p': 3}, transport=None)
+
+
+def test_save_jsonl_appends(input_data, tmpdir):
+    output_file = str(tmpdir.join('test.json'))
+    jsonl_file = save_jsonl(input_data, output_file, 'info', False, flush_every=1)
+    assert jsonl_file == str(tmpdir.join('test_info.jsonl'))
+    save_jsonl(iter([{'name': 'Charlie', 'age': 50}]), output_file, 'info', True)
+
+    assert list(read_jsonl(jsonl_file)) == input_data + [{'name': 'Charlie', 'age': 50}]
+
+    save_jsonl(input_data[:1], output_file, 'info', False)
+    assert list(read_jsonl(jsonl_file)) == input_data[:1]
+
+    with pytest.raises(ValueError):
+        save_jsonl(input_data, 'invalid', 'info', False)
+
+
+def test_save_jsonl_appends_after_partial_line(input_data, tmpdir):
+    output_file = str(tmpdir.join('test.json'))
+    jsonl_file = save_jsonl(input_data[:1], output_file, 'info', False)
+    with open(jsonl_file, 'a') as f:
+        f.write('{"name": "Bo')
+    save_jsonl(input_data[1:], output_file, 'info', True)
+
+    assert list(read_jsonl(jsonl_file)) == input_data
+
+
+def test_compact_jsonl(tmpdir):
+    jsonl_file = str(tmpdir.join('out.jsonl'))
+    with open(jsonl_file, 'w') as f:
+        f.write('{"url": "https://github.com/b", "v": 1}\n')
+        f.write('{"url": "https://github.com/a", "v": 1}\n')
+        f.write('{"url": "https://github.com/b", "v": 2}\n')
+        f.write('{"url": "https://github.com/c", "v"')  # truncated by a crash
+
+    compact_jsonl(jsonl_file)
+    assert list(read_jsonl(jsonl_file)) == [{'url': 'https://github.com/a', 'v': 1},
+                                            {'url': 'https://github.com/b', 'v': 2}]
+
+    json_file = compact_jsonl(jsonl_file, str(tmpdir.join('snapshot.json')))
+    with open(json_file, 'r') as f:
+        assert json.load(f) == [{'url': 'https://github.com/a', 'v': 1}, {'url': 'https://github.com/b', 'v': 2}]
+
+
+def test_read_batch_jsonl(tmpdir):
+    batch_file = str(tmpdir.join('jobs.jsonl'))
+    with open(batch_file, 'w') as f:
+        f.write('{"keywords": ["python"], "type": "repositories"}\n\n')
+        f.write('{"id": "wikis", "keywords": ["css"], "type": "wikis", "proxies": ["http://1.2.3.4:80"]}\n')
+
+    jobs = read_batch_jsonl(batch_file)
+    assert [job['id'] for job in jobs] == ['job1', 'wikis']
+    assert jobs[1]['proxies'] == ['http://1.2.3.4:80']
+
+    with open(batch_file, 'w') as f:
+        f.write('{"keywords": ["python"]}\n')
+    with pytest.raises(RuntimeError, match='missing keywords or type'):
+        read_batch_jsonl(batch_file)
+
+    with pytest.raises(RuntimeError, match='not found'):
+        read_batch_jsonl(str(tmpdir.join('missing.jsonl')))
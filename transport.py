@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import poolmanager
+from metrics import METRICS
+log = logging.getLogger("retrieve_github")
+
+
+def _timed_pool_classes(proxy):
+    # urllib3 pools whose connections report how long opening them took (TCP connect to the proxy,
+    # plus the CONNECT tunnel and TLS handshake for https).
+    def timed_connection(connection_cls):
+        class TimedConnection(connection_cls):
+            def connect(self):
+                start = time.perf_counter()
+                try:
+                    super().connect()
+                finally:
+                    METRICS.observe("request_connect_seconds", time.perf_counter() - start, proxy=proxy)
+                    METRICS.inc("connections_opened_total", proxy=proxy)
+        return TimedConnection
+
+    return {scheme: type(f"Timed{pool_cls.__name__}", (pool_cls,),
+                         {"ConnectionCls": timed_connection(pool_cls.ConnectionCls)})
+            for scheme, pool_cls in poolmanager.pool_classes_by_scheme.items()}
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not getattr(manager, "timed", False):
+            manager.pool_classes_by_scheme = _timed_pool_classes(proxy)
+            manager.timed = True
+        return manager
+
+
+class Transport:
+    # Keeps one pooled requests.Session per proxy so that TCP connections, proxy CONNECT tunnels
+    # and TLS sessions to github.com are reused across all the requests of a run.
+    def __init__(self, pool_connections=4, pool_maxsize=10, timeout=5, cache=None, rate_limiter=None, hedger=None):
+        if pool_connections < 1 or pool_maxsize < 1:
+            raise ValueError(f"Pool sizes must be >= 1, got {pool_connections} and {pool_maxsize}")
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        # Optional ResponseCache consulted by get_proxy_and_response before going to the network.
+        self.cache = cache
+        # Optional RateLimiter that paces the requests to every host and backs off when throttled.
+        self.rate_limiter = rate_limiter
+        # Optional Hedger that sends a backup copy of slow requests through another proxy.
+        self.hedger = hedger
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def session_for(self, proxy):
+        with self._lock:
+            session = self._sessions.get(proxy)
+            if session is None:
+                session = requests.Session()
+                adapter = TimedHTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.proxies = {"https": proxy, "http": proxy}
+                self._sessions[proxy] = session
+                log.debug(f"Opened HTTP session for proxy {proxy}")
+            return session
+
+    def get(self, proxy, url, headers, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session_for(proxy).get(url, headers=headers, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.hedger is not None:
+            self.hedger.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,48 +1,265 @@
-import copy
-import requests
-import random
 import json
 import os
 import logging
-from urllib.parse import urljoin
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timedelta
+from urllib.parse import urljoin, urlsplit
+from proxy_pool import ProxyPool
+from metrics import METRICS
+from ratelimit import throttle_delay
 log = logging.getLogger("retrieve_github")
-log.setLevel(logging.DEBUG)
 
 
-def get_proxy_and_response(proxies, url, headers, params):
-    proxies_temp = copy.copy(proxies)
-    while proxies_temp:
-        rand_int = random.randint(0, len(proxies_temp) - 1)
-        rand_proxy = proxies_temp.pop(rand_int)  # Retrieve and remove the first proxy from the list
-        proxy = {"https": rand_proxy,
-                 "http": rand_proxy
-                 }
-        try:
-            log.info(f"Trying request with the following proxy: {proxy}")
-            response = requests.get(url, proxies=proxy, headers=headers, timeout=5, params=params)
-            response.raise_for_status()
-            log.info(f"Request SUCCESS! {url} {proxy}")
-            return response
-        except requests.exceptions.HTTPError as errh:
-            log.error(f"HTTP Error: {errh}")
-        except requests.exceptions.ConnectionError as errc:
-            log.error(f"Error Connecting: {errc}")
-        except requests.exceptions.Timeout as errt:
-            log.error(f"Timeout Error: {errt}")
-        except requests.exceptions.RequestException as err:
-            log.error(f"Something went wrong: {err}")
-    log.error(f"ERROR: All proxies failed")
-    raise ValueError(f"ERROR: All proxies failed")
-
-
-def get_response(type_, query, proxies, headers, base_url):
+class ProxyLimiter:
+    # Caps the number of requests in flight through each proxy when fetching concurrently.
+    def __init__(self, max_per_proxy):
+        if max_per_proxy < 1:
+            raise ValueError(f"max_per_proxy must be >= 1, got {max_per_proxy}")
+        self.max_per_proxy = max_per_proxy
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def _semaphore(self, proxy):
+        with self._lock:
+            if proxy not in self._slots:
+                self._slots[proxy] = threading.BoundedSemaphore(self.max_per_proxy)
+            return self._slots[proxy]
+
+    def try_acquire(self, proxy):
+        return self._semaphore(proxy).acquire(blocking=False)
+
+    def acquire(self, proxy):
+        self._semaphore(proxy).acquire()
+
+    def release(self, proxy):
+        self._semaphore(proxy).release()
+
+
+def _pick_proxy(candidates, limiter):
+    # Candidates are ordered best-first; skip proxies that are saturated unless all of them are.
+    if limiter is None:
+        return candidates.pop(0), False
+    for i, candidate in enumerate(candidates):
+        if limiter.try_acquire(candidate):
+            return candidates.pop(i), True
+    return candidates.pop(0), False
+
+
+def _record_response(proxy, response, total, stream):
+    METRICS.inc("requests_total", proxy=proxy, outcome="success")
+    METRICS.observe("request_seconds", total, proxy=proxy)
+    # requests measures `elapsed` up to the parsed response headers, i.e. the time to first byte
+    # (including the connection setup when a new connection had to be opened).
+    elapsed = getattr(response, "elapsed", None)
+    if isinstance(elapsed, timedelta):
+        METRICS.observe("request_ttfb_seconds", elapsed.total_seconds(), proxy=proxy)
+        if not stream:
+            METRICS.observe("request_body_seconds", max(total - elapsed.total_seconds(), 0.0), proxy=proxy)
+    if not stream and isinstance(getattr(response, "_content", None), bytes):
+        METRICS.inc("response_bytes_total", len(response._content), proxy=proxy)
+
+
+# Returned by _try_proxy when GitHub throttled the request and it should be retried later.
+_THROTTLED = object()
+
+
+def _try_proxy(pool, rand_proxy, url, headers, request_kwargs, transport, limiter, host_limiter, retry_throttled,
+               stream, hedge=False):
+    # One request through one proxy: the response, _THROTTLED, or None when the proxy failed. The
+    # caller has acquired the proxy's limiter slot, which is released here.
+    import requests
+    proxy = {"https": rand_proxy,
+             "http": rand_proxy
+             }
+    if host_limiter is not None:
+        host_limiter.acquire(hedge)
+    retry_after = None
+    start = time.monotonic()
+    try:
+        log.info(f"Trying request with the following proxy: {proxy}")
+        if transport is not None:
+            response = transport.get(rand_proxy, url, headers, **request_kwargs)
+        else:
+            response = requests.get(url, proxies=proxy, headers=headers, timeout=5, **request_kwargs)
+        if host_limiter is not None:
+            retry_after = throttle_delay(response)
+            if retry_after is not None and retry_throttled:
+                # Throttling is about our request rate, not about this proxy: back off and retry
+                # instead of burning the proxy.
+                METRICS.inc("requests_total", proxy=rand_proxy, outcome="throttled")
+                log.warning(f"Throttled (HTTP {response.status_code}), retrying {url} in {retry_after:.0f}s")
+                # A streamed body is still unread: closing it hands the connection back to the pool.
+                response.close()
+                return _THROTTLED
+        response.raise_for_status()
+        pool.record_success(rand_proxy, time.monotonic() - start)
+        _record_response(rand_proxy, response, time.monotonic() - start, stream)
+        log.info(f"Request SUCCESS! {url} {proxy}")
+        return response
+    except requests.exceptions.HTTPError as errh:
+        METRICS.inc("requests_total", proxy=rand_proxy, outcome="http_error")
+        log.error(f"HTTP Error: {errh}")
+    except requests.exceptions.ConnectionError as errc:
+        METRICS.inc("requests_total", proxy=rand_proxy, outcome="connection_error")
+        log.error(f"Error Connecting: {errc}")
+    except requests.exceptions.Timeout as errt:
+        METRICS.inc("requests_total", proxy=rand_proxy, outcome="timeout")
+        log.error(f"Timeout Error: {errt}")
+    except requests.exceptions.RequestException as err:
+        METRICS.inc("requests_total", proxy=rand_proxy, outcome="error")
+        log.error(f"Something went wrong: {err}")
+    finally:
+        if limiter is not None:
+            limiter.release(rand_proxy)
+        if host_limiter is not None:
+            host_limiter.release(throttled=retry_after is not None, retry_after=retry_after, hedge=hedge)
+    pool.record_failure(rand_proxy)
+    return None
+
+
+def _hedged_fetch(candidates, next_proxy, next_hedge_proxy, attempt, hedger):
+    # Sends the request through the best proxy and, whenever no answer arrived within
+    # hedger.delay(), a backup copy through the next free one (at most hedger.max_hedges of them).
+    # The first good response wins; the other responses are closed, those of requests still in
+    # flight once they finish in the background.
+    hedger.start_request()
+    executor = hedger.executor
+    in_flight = set()
+    hedged = set()
+    may_hedge = True
+
+    def close_loser(future):
+        response = future.result()
+        if response is not None and response is not _THROTTLED:
+            response.close()
+
+    try:
+        while candidates or in_flight:
+            if not in_flight:
+                in_flight.add(executor.submit(attempt, next_proxy()))
+            timeout = None
+            if candidates and may_hedge and len(hedged) < hedger.max_hedges:
+                timeout = hedger.delay()
+            done, in_flight = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                rand_proxy = next_hedge_proxy()
+                if rand_proxy is None:
+                    may_hedge = False
+                    continue
+                log.info(f"No answer after {timeout:.2f}s, hedging on proxy {rand_proxy}")
+                METRICS.inc("hedged_requests_total")
+                future = executor.submit(attempt, rand_proxy, True)
+                hedged.add(future)
+                in_flight.add(future)
+                continue
+            winner = None
+            for future in done:
+                response = future.result()
+                if winner is None and response is not None and response is not _THROTTLED:
+                    winner = future
+                else:
+                    close_loser(future)
+            if winner is not None:
+                if winner in hedged:
+                    METRICS.inc("hedged_wins_total")
+                return winner.result()
+        return None
+    finally:
+        for future in in_flight:
+            future.add_done_callback(close_loser)
+
+
+def get_proxy_and_response(proxies, url, headers, params=None, limiter=None, transport=None, stream=False):
+    cache = transport.cache if transport is not None else None
+    cached = None
+    if cache is not None:
+        cached = cache.lookup(url, params)
+        if cached is not None and cache.is_fresh(cached):
+            cache.record_hit()
+            METRICS.inc("cache_lookups_total", result="hit")
+            log.info(f"Cache hit: {url}")
+            return cache.to_response(cached)
+        cache.record_miss()
+        METRICS.inc("cache_lookups_total", result="miss")
+        if cached is not None:
+            headers = {**headers, **cache.conditional_headers(cached)}
+
+    rate_limiter = transport.rate_limiter if transport is not None else None
+    host_limiter = rate_limiter.for_host(urlsplit(url).hostname) if rate_limiter is not None else None
+    # Hedging streamed requests would leave bodies half read on several connections.
+    hedger = transport.hedger if transport is not None and not stream else None
+    throttle_retries = [0]
+
+    pool = proxies if isinstance(proxies, ProxyPool) else ProxyPool(proxies)
+    candidates = pool.candidates()
+    request_kwargs = {"params": params} if params else {}
+    if stream:
+        request_kwargs["stream"] = True
+
+    def next_proxy():
+        rand_proxy, acquired = _pick_proxy(candidates, limiter)
+        if limiter is not None and not acquired:
+            limiter.acquire(rand_proxy)
+        return rand_proxy
+
+    def next_hedge_proxy():
+        # Only a proxy that is free right now and only within the hedging budget. Waiting for a
+        # proxy here would keep a primary response that arrives meanwhile from being returned.
+        for i, candidate in enumerate(candidates):
+            if limiter is None or limiter.try_acquire(candidate):
+                if hedger.allow_hedge():
+                    return candidates.pop(i)
+                if limiter is not None:
+                    limiter.release(candidate)
+                return None
+        return None
+
+    def attempt(rand_proxy, hedge=False):
+        retry_throttled = host_limiter is not None and throttle_retries[0] < rate_limiter.max_throttle_retries
+        start = time.monotonic()
+        response = _try_proxy(pool, rand_proxy, url, headers, request_kwargs, transport, limiter, host_limiter,
+                              retry_throttled, stream, hedge)
+        if response is _THROTTLED:
+            throttle_retries[0] += 1
+            candidates.append(rand_proxy)
+        elif response is not None and hedger is not None:
+            hedger.observe(time.monotonic() - start)
+        return response
+
+    response = None
+    if hedger is not None:
+        response = _hedged_fetch(candidates, next_proxy, next_hedge_proxy, attempt, hedger)
+    while response is None and candidates:
+        response = attempt(next_proxy())
+        if response is _THROTTLED:
+            response = None
+    if response is None:
+        log.error(f"ERROR: All proxies failed")
+        raise RuntimeError(f"ERROR: All proxies failed")
+    if cache is not None:
+        if response.status_code == 304 and cached is not None:
+            METRICS.inc("cache_lookups_total", result="revalidated")
+            return cache.refresh(cached, response)
+        if not stream:
+            # A streamed body is deliberately not read in full, so it cannot be cached.
+            cache.store(url, params, response)
+    return response
+
+
+def get_response(type_, query, proxies, headers, base_url, transport=None, page=1):
 
     if type_.lower() == "repositories" or type_.lower() == "issues" or type_.lower() == "wikis":
-        url = urljoin(base_url, "/search?q=", query)
+        url = urljoin(base_url, "/search")
     else:
         raise ValueError("Invalid object type. Supported types are 'Repositories', 'Issues', and 'Wikis'.")
 
-    response = get_proxy_and_response(proxies, url, headers, type_.lower())
+    # Keywords come joined with '+', the URL-encoded form of a space.
+    params = {"q": query.replace('+', ' '), "type": type_.lower()}
+    if page > 1:
+        params["p"] = page
+    response = get_proxy_and_response(proxies, url, headers, params, transport=transport)
     return response
 
 
@@ -68,21 +285,173 @@ def read_input_json(input_json):
     return keywords, proxies, type_
 
 
+def read_batch_jsonl(batch_file):
+    # One job per line: {"keywords": [...], "type": "...", "id": optional, "output_file": optional,
+    # "proxies": optional}. All the jobs of a batch share one proxy pool.
+    jobs = []
+    try:
+        with open(batch_file, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                job = json.loads(line)
+                if not isinstance(job, dict) or not all([job.get('keywords'), job.get('type')]):
+                    raise RuntimeError(f'Job on line {line_number} of {batch_file} is missing keywords or type.')
+                job.setdefault('id', f'job{len(jobs) + 1}')
+                jobs.append(job)
+    except FileNotFoundError:
+        log.error(f'Error: File {batch_file} not found.')
+        raise RuntimeError(f'Error: File {batch_file} not found.')
+    except json.JSONDecodeError:
+        log.error(f'Error: Invalid JSON format in {batch_file}.')
+        raise RuntimeError(f'Error: Invalid JSON format in {batch_file}.')
+    if not jobs:
+        raise RuntimeError(f'No jobs found in {batch_file}.')
+    return jobs
+
+
+def _write_json_array(records, outfile):
+    # Same layout as json.dump(records, outfile, indent=4), written one record at a time.
+    count = 0
+    for record in records:
+        outfile.write("[\n" if count == 0 else ",\n")
+        outfile.write("    " + json.dumps(record, indent=4).replace("\n", "\n    "))
+        count += 1
+    outfile.write("\n]" if count else "[]")
+    return count
+
+
 def save_json(retrieved_info, output_file, type_, append_output):
     extension = output_file.split('/')[-1].split('.')[-1]
     if extension != 'json':
         raise ValueError
     output_file = output_file.split('.json')[0] + "_" + type_.lower() + ".json"
+    existing_data = None
     if os.path.exists(output_file) and append_output:
         # Open the JSON file for reading
         with open(output_file, 'r') as outfile:
             existing_data = json.load(outfile)
             existing_data.extend(retrieved_info)
-        with open(output_file, 'w') as outfile:
-            json.dump(existing_data, outfile, indent=4)
-    else:
-        with open(output_file, "w") as outfile:
-            json.dump(retrieved_info, outfile, indent=4)
+    # The previous output is only replaced once the new one is complete: a crawl that fails halfway
+    # must not leave it truncated (--incremental reads it back as its baseline).
+    tmp_file = output_file + ".tmp"
+    try:
+        with open(tmp_file, "w") as outfile:
+            if existing_data is not None:
+                json.dump(existing_data, outfile, indent=4)
+            else:
+                # retrieved_info may be a generator, so records are written as they arrive.
+                _write_json_array(retrieved_info, outfile)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, output_file)
+
+    return output_file
+
+
+class JsonlWriter:
+    # Appends one JSON record per line. Records are flushed (and fsynced) in batches so that a
+    # crash loses at most the last batch while a run never rewrites what is already on disk.
+    def __init__(self, output_file, append=True, flush_every=100, fsync=True):
+        if flush_every < 1:
+            raise ValueError(f"flush_every must be >= 1, got {flush_every}")
+        self.output_file = output_file
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.count = 0
+        self._pending = 0
+        needs_newline = append and self._ends_with_partial_line(output_file)
+        self._file = open(output_file, "a" if append else "w")
+        if needs_newline:
+            # A run killed mid-write left a partial last line: end it, so the first new record gets a
+            # line of its own instead of being glued onto it (read_jsonl skips the partial one).
+            log.warning(f"{output_file} ends with a partial line, starting the new records on the next one")
+            self._file.write("\n")
 
+    @staticmethod
+    def _ends_with_partial_line(output_file):
+        try:
+            with open(output_file, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def typed_output_file(output_file, type_, extension):
+    # output.json -> output_repositories.json
+    base_name, _ = os.path.splitext(output_file)
+    return base_name + "_" + type_.lower() + extension
+
+
+def save_jsonl(retrieved_info, output_file, type_, append_output, flush_every=100, fsync=True):
+    extension = os.path.splitext(output_file)[1]
+    if extension not in ('.json', '.jsonl'):
+        raise ValueError(f"Output file must have a .json or .jsonl extension: {output_file}")
+    output_file = typed_output_file(output_file, type_, ".jsonl")
+    with JsonlWriter(output_file, append=append_output, flush_every=flush_every, fsync=fsync) as writer:
+        for record in retrieved_info:
+            writer.write(record)
+    log.info(f"Wrote {writer.count} records to {output_file}")
     return output_file
 
+
+def read_jsonl(input_file):
+    with open(input_file, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Usually the last line of a run that was killed mid-write.
+                log.warning(f"Skipping malformed line {line_number} in {input_file}")
+
+
+def compact_jsonl(input_file, output_file=None):
+    # Deduplicates by URL (the most recent record wins) into a snapshot sorted by URL. A .json
+    # output_file exports the snapshot in the JSON array format written by save_json.
+    output_file = output_file or input_file
+    records = {}
+    for record in read_jsonl(input_file):
+        records[record.get("url")] = record
+    snapshot = [records[url] for url in sorted(records, key=lambda url: url or "")]
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w") as outfile:
+        if output_file.endswith(".json"):
+            json.dump(snapshot, outfile, indent=4)
+        else:
+            for record in snapshot:
+                outfile.write(json.dumps(record, separators=(",", ":")) + "\n")
+    os.replace(tmp_file, output_file)
+    log.info(f"Compacted {input_file} into {len(snapshot)} records: {output_file}")
+    return output_file